@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 import os
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -52,7 +53,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -145,9 +149,132 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
 
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Per-user versioned cache of list responses. Only enable it with a cache
+# shared by all workers, otherwise a write in one worker leaves the others
+# serving stale lists.
+RECIPE_API_CACHE_ENABLED = bool(
+    int(os.environ.get('RECIPE_API_CACHE_ENABLED', 0))
+)
+RECIPE_API_CACHE_ALIAS = 'default'
+RECIPE_API_CACHE_TIMEOUT = int(os.environ.get('RECIPE_API_CACHE_TIMEOUT', 300))
+
+# Token -> user lookups are cached in the shared cache
+AUTH_TOKEN_CACHE_ALIAS = 'default'
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.environ.get('AUTH_TOKEN_CACHE_TIMEOUT', 300))
+
+# Prometheus metrics at /metrics (core.metrics). With several worker
+# processes set PROMETHEUS_MULTIPROC_DIR to a directory emptied before
+# they start, so their metrics are summed. METRICS_TOKEN, when set, must
+# be sent as a bearer token.
+METRICS_ENABLED = bool(int(os.environ.get('METRICS_ENABLED', 1)))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Per request timings (core.middleware.ServerTimingMiddleware): a
+# Server-Timing header when SERVER_TIMING=1, and a warning with the
+# slowest queries for requests over SLOW_REQUEST_MS (0 disables). The
+# middleware is skipped when both are off.
+SERVER_TIMING = bool(int(os.environ.get('SERVER_TIMING', 0)))
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 0))
+SLOW_REQUEST_QUERIES = int(os.environ.get('SLOW_REQUEST_QUERIES', 5))
+
+# Codings the app compresses API responses with itself, in order of
+# preference (br needs the brotli package). Leave empty behind the proxy,
+# which gzips them; core.middleware sets Vary either way.
+API_COMPRESSION = [
+    coding.strip()
+    for coding in os.environ.get('API_COMPRESSION', '').split(',')
+    if coding.strip()
+]
+API_COMPRESSION_MIN_LENGTH = int(
+    os.environ.get('API_COMPRESSION_MIN_LENGTH', 1024)
+)
+
+# JSON goes through orjson when it is installed (same output); MessagePack
+# (application/msgpack) is offered when msgpack is installed
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
+if find_spec('msgpack'):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append(
+        'core.renderers.MessagePackRenderer',
+    )
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append(
+        'core.parsers.MessagePackParser',
+    )
+
+# Cursor pagination is opt-in via ?page_size= or ?cursor= on list endpoints
+RECIPE_API_PAGE_SIZE = int(os.environ.get('RECIPE_API_PAGE_SIZE', 50))
+RECIPE_API_MAX_PAGE_SIZE = int(os.environ.get('RECIPE_API_MAX_PAGE_SIZE', 200))
+RECIPE_API_BULK_MAX_ITEMS = int(os.environ.get('RECIPE_API_BULK_MAX_ITEMS', 500))
+RECIPE_EXPORT_BATCH_SIZE = int(os.environ.get('RECIPE_EXPORT_BATCH_SIZE', 500))
+
+# List endpoints render straight from values() rows (recipe.fastpath)
+# instead of through their serializers; the output is the same
+RECIPE_API_FAST_LIST = bool(int(os.environ.get('RECIPE_API_FAST_LIST', 1)))
+
+# Tag/ingredient autocomplete; results are cached per user for a short time
+# (0 disables) so they stay bounded even with a per-process cache.
+RECIPE_API_AUTOCOMPLETE_LIMIT = int(
+    os.environ.get('RECIPE_API_AUTOCOMPLETE_LIMIT', 10)
+)
+RECIPE_API_AUTOCOMPLETE_MAX_LIMIT = int(
+    os.environ.get('RECIPE_API_AUTOCOMPLETE_MAX_LIMIT', 50)
+)
+RECIPE_API_AUTOCOMPLETE_CACHE_TIMEOUT = int(
+    os.environ.get('RECIPE_API_AUTOCOMPLETE_CACHE_TIMEOUT', 30)
+)
+
+# Resized copies made of every recipe image, as name -> longest side in px.
+# They are generated by a background job once the upload commits.
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': 200,
+    'medium': 800,
+    'large': 1600,
+}
+RECIPE_IMAGE_QUALITY = int(os.environ.get('RECIPE_IMAGE_QUALITY', 85))
+
+# Uploads are streamed to disk and rejected as soon as they exceed the size
+# limit (keep it in line with client_max_body_size in the proxy) or their
+# header shows an unsupported format or too many pixels.
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = int(
+    os.environ.get('RECIPE_IMAGE_MAX_UPLOAD_SIZE', 10 * 2 ** 20)
+)
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.environ.get('RECIPE_IMAGE_MAX_PIXELS', 40_000_000)
+)
+RECIPE_IMAGE_FORMATS = ['JPEG', 'PNG']
+
+# Background jobs (core.jobs) are run by `manage.py run_worker`. Failed jobs
+# are retried after JOB_RETRY_DELAY seconds, doubling up to the max delay;
+# running jobs not done after JOB_TIMEOUT seconds are assumed lost and
+# requeued. JOBS_EAGER runs jobs in process once the enqueuing transaction
+# commits instead, for development without a worker.
+JOBS_EAGER = bool(int(os.environ.get('JOBS_EAGER', 0)))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+JOB_RETRY_DELAY = int(os.environ.get('JOB_RETRY_DELAY', 10))
+JOB_RETRY_MAX_DELAY = int(os.environ.get('JOB_RETRY_MAX_DELAY', 3600))
+JOB_TIMEOUT = int(os.environ.get('JOB_TIMEOUT', 600))
+JOB_WORKER_CONCURRENCY = int(os.environ.get('JOB_WORKER_CONCURRENCY', 4))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1))
 
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
@@ -14,3 +14,13 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+try:
+    import uwsgi
+except ImportError:
+    pass
+else:
+    from core.metrics import mark_process_dead
+
+    # Drop the metrics of uwsgi workers as they exit
+    uwsgi.atexit = lambda: mark_process_dead(os.getpid())
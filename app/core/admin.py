@@ -40,7 +40,15 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
+
+class JobAdmin(admin.ModelAdmin):
+    """Define the admin page for background jobs"""
+    ordering = ['run_at']
+    list_display = ['id', 'name', 'status', 'attempts', 'run_at']
+    list_filter = ['status', 'name']
+
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Recipe)
 admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
\ No newline at end of file
+admin.site.register(models.Ingredient)
+admin.site.register(models.Job, JobAdmin)
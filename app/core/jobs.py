@@ -0,0 +1,176 @@
+"""
+A small background job queue kept in PostgreSQL.
+
+Calls of functions decorated with @task are stored as Job rows by
+enqueue(), in the caller's transaction, so a job only exists if the work
+needing it commits. `manage.py run_worker` claims due jobs with
+SELECT ... FOR UPDATE SKIP LOCKED, so any number of workers can poll the
+table without blocking each other or taking the same job. Finished jobs
+are deleted; failed ones are retried with exponential backoff and kept
+as failed once they run out of attempts.
+"""
+from datetime import timedelta
+import logging
+import random
+import traceback
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.models import Job
+
+
+logger = logging.getLogger(__name__)
+
+
+def task(func):
+    """Allow a module level function to be enqueued as a job"""
+    func.job_name = f'{func.__module__}.{func.__qualname__}'
+    return func
+
+
+def enqueue(func, *args, run_at=None, max_attempts=None, **kwargs):
+    """
+    Queue a call of the task func. Arguments must be JSON serializable.
+    With JOBS_EAGER the job runs in process once the transaction commits.
+    """
+    if not hasattr(func, 'job_name'):
+        raise TypeError(f'{func!r} is not a task')
+    job = Job.objects.create(
+        name=func.job_name,
+        args=list(args),
+        kwargs=kwargs,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+    if settings.JOBS_EAGER:
+        transaction.on_commit(lambda: _run_eagerly(job.pk))
+    return job
+
+
+def _claim(jobs, worker, limit):
+    with transaction.atomic():
+        claimed = list(
+            jobs.select_for_update(skip_locked=True).filter(
+                status=Job.QUEUED,
+            ).order_by('run_at')[:limit]
+        )
+        now = timezone.now()
+        Job.objects.filter(pk__in=[job.pk for job in claimed]).update(
+            status=Job.RUNNING,
+            locked_by=worker,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+    for job in claimed:
+        job.status, job.locked_by, job.locked_at = Job.RUNNING, worker, now
+        job.attempts += 1
+    return claimed
+
+
+def claim(worker, limit=1):
+    """Mark up to limit due jobs as running by worker and return them"""
+    return _claim(
+        Job.objects.filter(run_at__lte=timezone.now()),
+        worker,
+        limit,
+    )
+
+
+def _run_eagerly(job_id):
+    due = Job.objects.filter(pk=job_id, run_at__lte=timezone.now())
+    for job in _claim(due, 'eager', 1):
+        run_job(job)
+
+
+def retry_delay(attempts):
+    """Seconds to wait before another attempt, doubling each time"""
+    delay = min(
+        settings.JOB_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.JOB_RETRY_MAX_DELAY,
+    )
+    # Jitter, so jobs failing together are not all retried together
+    return delay * random.uniform(0.5, 1)
+
+
+def run_job(job):
+    """Run a claimed job, then delete it or record the failure"""
+    try:
+        func = import_string(job.name)
+        if getattr(func, 'job_name', None) != job.name:
+            raise TypeError(f'{job.name} is not a task')
+        func(*job.args, **job.kwargs)
+    except Exception:
+        _failed(job, traceback.format_exc())
+    else:
+        Job.objects.filter(pk=job.pk).delete()
+
+
+def _failed(job, error):
+    now = timezone.now()
+    jobs = Job.objects.filter(pk=job.pk)
+    if job.attempts >= job.max_attempts:
+        logger.error('Job %s %s failed for good: %s', job.pk, job.name, error)
+        jobs.update(status=Job.FAILED, last_error=error, finished_at=now)
+        return
+    logger.warning('Job %s %s failed, retrying: %s', job.pk, job.name, error)
+    jobs.update(
+        status=Job.QUEUED,
+        run_at=now + timedelta(seconds=retry_delay(job.attempts)),
+        last_error=error,
+        locked_by='',
+        locked_at=None,
+    )
+
+
+def execute(job):
+    """Run a claimed job in a pool thread or process"""
+    close_old_connections()
+    try:
+        run_job(job)
+    finally:
+        close_old_connections()
+
+
+def requeue_stale():
+    """
+    Queue the jobs left running longer than JOB_TIMEOUT again, their
+    worker most likely died. Returns the number of jobs requeued.
+    """
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=timezone.now() - timedelta(
+            seconds=settings.JOB_TIMEOUT,
+        ),
+    )
+    # Jobs that keep killing their worker must not loop forever
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED,
+        last_error='Timed out',
+        finished_at=timezone.now(),
+    )
+    return stale.update(status=Job.QUEUED, locked_by='', locked_at=None)
+
+
+def queue_depth():
+    """
+    Return the number of jobs due, scheduled for later, running and
+    failed, and how many seconds the oldest due job has been waiting.
+    """
+    now = timezone.now()
+    due = Q(status=Job.QUEUED, run_at__lte=now)
+    depth = Job.objects.aggregate(
+        due=Count('pk', filter=due),
+        scheduled=Count('pk', filter=Q(status=Job.QUEUED, run_at__gt=now)),
+        running=Count('pk', filter=Q(status=Job.RUNNING)),
+        failed=Count('pk', filter=Q(status=Job.FAILED)),
+        oldest_due=Min('run_at', filter=due),
+    )
+    oldest_due = depth.pop('oldest_due')
+    depth['oldest_due_age'] = (
+        (now - oldest_due).total_seconds() if oldest_due else 0.0
+    )
+    return depth
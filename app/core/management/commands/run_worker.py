@@ -0,0 +1,133 @@
+"""
+Django command to run background jobs
+"""
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+import os
+import signal
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Claim due background jobs from the database and run them in a pool '
+        'of threads or processes until stopped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.JOB_WORKER_CONCURRENCY,
+            help='Number of jobs run at the same time',
+        )
+        parser.add_argument(
+            '--pool',
+            choices=['thread', 'process'],
+            default='thread',
+            help='Run jobs in threads, or in processes for CPU bound jobs',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.JOB_POLL_INTERVAL,
+            help='Seconds to wait before looking for jobs again when idle',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once no jobs are due instead of waiting for more',
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Print the queue depth and exit',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        if options['stats']:
+            for key, value in jobs.queue_depth().items():
+                self.stdout.write(f'{key}: {value}')
+            return
+
+        self.stopping = False
+        handlers = {
+            signum: signal.signal(signum, self._stop)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        concurrency = max(options['concurrency'], 1)
+        pool = self._pool(options['pool'], concurrency)
+        self.stdout.write(
+            f"Worker {worker} running up to {concurrency} jobs in a "
+            f"{options['pool']} pool"
+        )
+        try:
+            self._work(worker, pool, concurrency, options)
+        finally:
+            # Let running jobs finish, they would be retried otherwise
+            pool.shutdown(wait=True)
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker} stopped'))
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+
+    def _pool(self, kind, concurrency):
+        if kind == 'thread':
+            return ThreadPoolExecutor(
+                max_workers=concurrency,
+                thread_name_prefix='jobs',
+            )
+        # Forked children must not share the parent's database connection;
+        # start them all now, before it is opened again
+        connections.close_all()
+        pool = ProcessPoolExecutor(max_workers=concurrency)
+        pool.submit(int).result()
+        return pool
+
+    def _work(self, worker, pool, concurrency, options):
+        running = set()
+        last_requeue = 0
+        while not self.stopping:
+            if time.monotonic() - last_requeue > settings.JOB_TIMEOUT / 10:
+                requeued = jobs.requeue_stale()
+                if requeued:
+                    self.stdout.write(f'Requeued {requeued} stale jobs')
+                last_requeue = time.monotonic()
+
+            if len(running) < concurrency:
+                claimed = jobs.claim(worker, concurrency - len(running))
+                running.update(
+                    pool.submit(jobs.execute, job) for job in claimed
+                )
+            if not running and options['burst']:
+                return
+            if not running:
+                time.sleep(options['poll_interval'])
+                continue
+            done, running = wait(
+                running,
+                timeout=options['poll_interval'],
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                if future.exception():
+                    # Failures of the jobs themselves are recorded on them,
+                    # this is the worker failing to record the outcome
+                    self.stderr.write(
+                        f'Running a job failed: {future.exception()!r}'
+                    )
@@ -0,0 +1,165 @@
+"""
+Prometheus metrics, exposed at /metrics.
+
+uwsgi runs several worker processes, each with its own metrics. When
+PROMETHEUS_MULTIPROC_DIR is set, prometheus_client keeps them in memory
+mapped files in that directory and registry() sums them over every
+process, so no collector service is needed. Without it (runserver, tests)
+they stay in memory. Database and job queue state is read when scraped.
+"""
+import os
+import time
+
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from core import jobs
+
+
+# Anything else is counted as 'other', so labels stay bounded
+METHODS = {'GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE'}
+
+REQUESTS = Counter(
+    'api_requests_total',
+    'Requests handled, by view, method and status',
+    ['view', 'method', 'status'],
+)
+REQUEST_DURATION = Histogram(
+    'api_request_duration_seconds',
+    'Time to handle a request, by view and method',
+    ['view', 'method'],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'api_requests_in_progress',
+    'Requests being handled, by view and method',
+    ['view', 'method'],
+    multiprocess_mode='livesum',
+)
+REQUEST_QUERIES = Histogram(
+    'api_request_queries',
+    'Database queries per request, by view',
+    ['view'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, float('inf')),
+)
+DB_QUERY_DURATION = Histogram(
+    'db_query_duration_seconds',
+    'Database query time',
+    ['alias'],
+    buckets=(
+        .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5,
+        float('inf'),
+    ),
+)
+DB_CONNECTIONS_OPENED = Counter(
+    'db_connections_opened_total',
+    'Database connections opened',
+    ['alias'],
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total',
+    'Cache lookups, by cache and result',
+    ['cache', 'result'],
+)
+
+
+def method_label(method):
+    return method if method in METHODS else 'other'
+
+
+class QueryObserver:
+    """Database execute wrapper counting and timing queries"""
+
+    def __init__(self, alias):
+        self.duration = DB_QUERY_DURATION.labels(alias)
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration.observe(time.perf_counter() - start)
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    DB_CONNECTIONS_OPENED.labels(connection.alias).inc()
+
+
+class StateCollector:
+    """Database server connections and the job queue, read when scraped"""
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        connections = GaugeMetricFamily(
+            'db_server_connections',
+            'Connections to the database, by state',
+            labels=['state'],
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT coalesce(state, 'unknown'), count(*) "
+                'FROM pg_stat_activity WHERE datname = current_database() '
+                'GROUP BY 1'
+            )
+            for state, count in cursor.fetchall():
+                connections.add_metric([state], count)
+            cursor.execute('SHOW max_connections')
+            max_connections = int(cursor.fetchone()[0])
+        yield connections
+        yield GaugeMetricFamily(
+            'db_server_max_connections',
+            'Connections the database server accepts',
+            value=max_connections,
+        )
+
+        depth = jobs.queue_depth()
+        queue = GaugeMetricFamily(
+            'job_queue_jobs',
+            'Background jobs, by state',
+            labels=['state'],
+        )
+        for state in ('due', 'scheduled', 'running', 'failed'):
+            queue.add_metric([state], depth[state])
+        yield queue
+        yield GaugeMetricFamily(
+            'job_queue_oldest_due_age_seconds',
+            'How long the oldest due job has been waiting',
+            value=depth['oldest_due_age'],
+        )
+
+
+state = StateCollector()
+if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+    REGISTRY.register(state)
+
+
+def registry():
+    """Return the registry to expose, summing processes if multiprocess"""
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        return REGISTRY
+    combined = CollectorRegistry()
+    multiprocess.MultiProcessCollector(combined, path)
+    combined.register(state)
+    return combined
+
+
+def mark_process_dead(pid):
+    """Drop the in progress gauges of a finished worker process"""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,285 @@
+"""
+API wide middleware.
+"""
+from contextlib import ExitStack
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+from core import metrics, timing
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+
+# API payloads worth compressing, as in gzip_types in the proxy config.
+# HTML (browsable API, admin) is left alone as it carries CSRF tokens.
+COMPRESSIBLE_TYPES = {
+    'application/json',
+    'application/msgpack',
+    'application/vnd.oai.openapi',
+    'application/vnd.oai.openapi+json',
+    'application/x-ndjson',
+    'text/csv',
+}
+
+# Quality 5 compresses about as fast as gzip level 6 and better
+BROTLI_QUALITY = 5
+
+
+def brotli_compress_string(content):
+    return brotli.compress(content, quality=BROTLI_QUALITY)
+
+
+def brotli_compress_sequence(sequence):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+COMPRESSORS = {'gzip': (compress_string, compress_sequence)}
+if brotli:
+    COMPRESSORS['br'] = (brotli_compress_string, brotli_compress_sequence)
+
+
+def accepted_encodings(header):
+    """Return the content codings of an Accept-Encoding header, but q=0"""
+    accepted = set()
+    for part in header.split(','):
+        coding, *params = [value.strip() for value in part.split(';')]
+        quality = '1'
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                quality = value.strip()
+        try:
+            if coding and float(quality) > 0:
+                accepted.add(coding.lower())
+        except ValueError:
+            pass
+    return accepted
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress API responses with the first coding in API_COMPRESSION the
+    client accepts. Behind the proxy API_COMPRESSION is empty and nginx
+    compresses, but this still sets Vary, on 304 responses as well, so
+    caches keep compressed and plain copies apart.
+    """
+
+    def process_response(self, request, response):
+        if response.status_code == 304:
+            patch_vary_headers(response, ('Accept-Encoding',))
+            return response
+        content_type = response.get('Content-Type', '').partition(';')[0]
+        if (content_type.strip().lower() not in COMPRESSIBLE_TYPES or
+                response.has_header('Content-Encoding')):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if (not response.streaming and len(response.content) <
+                settings.API_COMPRESSION_MIN_LENGTH):
+            return response
+
+        accepted = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        for coding in settings.API_COMPRESSION:
+            if coding in COMPRESSORS and (
+                    coding in accepted or '*' in accepted):
+                break
+        else:
+            return response
+
+        compress_string, compress_sequence = COMPRESSORS[coding]
+        if response.streaming:
+            response.streaming_content = compress_sequence(
+                response.streaming_content
+            )
+            del response['Content-Length']
+        else:
+            compressed = compress_string(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # Like GZipMiddleware; If-None-Match compares ETags weakly
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = coding
+        return response
+
+
+class ServerTimingMiddleware:
+    """
+    Time each request: database queries, serializers, the view and
+    rendering. Adds a Server-Timing header when SERVER_TIMING is set and
+    logs requests slower than SLOW_REQUEST_MS with their slowest queries.
+    Unused, so free, when both are off.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING and not settings.SLOW_REQUEST_MS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        timing.install()
+
+    def __call__(self, request):
+        request_timing = timing.RequestTiming(
+            keep_queries=settings.SLOW_REQUEST_QUERIES
+            if settings.SLOW_REQUEST_MS else 0,
+        )
+        token = timing.current.set(request_timing)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(request_timing.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            timing.current.reset(token)
+
+        durations = request_timing.durations
+        now = time.perf_counter()
+        durations['total'] = now - request_timing.start
+        if request_timing.view_start and 'view' not in durations:
+            durations['view'] = now - request_timing.view_start
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = self.header(request_timing)
+        if (settings.SLOW_REQUEST_MS and
+                durations['total'] * 1000 >= settings.SLOW_REQUEST_MS):
+            self.log(request, response, request_timing)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request_timing = timing.current.get()
+        request_timing.view = timing.view_name(view_func, request)
+        request_timing.view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        request_timing = timing.current.get()
+        durations = request_timing.durations
+        start = time.perf_counter()
+        durations['view'] = start - request_timing.view_start
+
+        def rendered(response):
+            durations['render'] = time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def header(self, request_timing):
+        """Return the Server-Timing header value, durations in ms"""
+        durations = request_timing.durations
+        metrics = [f'total;dur={durations["total"] * 1000:.1f}']
+        if request_timing.view:
+            metrics.append(
+                f'view;dur={durations["view"] * 1000:.1f};'
+                f'desc="{request_timing.view}"'
+            )
+        metrics.append(
+            f'db;dur={durations["db"] * 1000:.1f};'
+            f'desc="{request_timing.queries} queries"'
+        )
+        for name in ('serialize', 'render'):
+            if name in durations:
+                metrics.append(f'{name};dur={durations[name] * 1000:.1f}')
+        return ', '.join(metrics)
+
+    def log(self, request, response, request_timing):
+        """Log a slow request with its slowest queries"""
+        durations = request_timing.durations
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': request_timing.view,
+            'status': response.status_code,
+            'queries': request_timing.queries,
+            **{
+                f'{name}_ms': round(durations[name] * 1000, 1)
+                for name in ('total', 'view', 'db', 'serialize', 'render')
+                if name in durations
+            },
+            'sql': [
+                {'ms': round(duration * 1000, 1), 'sql': sql}
+                for duration, sql in request_timing.slowest_queries()
+            ],
+        }
+        logger.warning(
+            'Slow request %s %s (%s): %.0f ms, %d queries in %.0f ms%s',
+            request.method,
+            request.path,
+            request_timing.view,
+            record['total_ms'],
+            record['queries'],
+            record['db_ms'],
+            ''.join(
+                f'\n  {query["ms"]} ms: {query["sql"]}'
+                for query in record['sql']
+            ),
+            extra={'timing': record},
+        )
+
+
+class MetricsMiddleware:
+    """
+    Count, time and track in progress requests by view for /metrics, with
+    their database queries. Unused when METRICS_ENABLED is off.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        observers = []
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    observer = metrics.QueryObserver(connection.alias)
+                    observers.append(observer)
+                    stack.enter_context(connection.execute_wrapper(observer))
+                response = self.get_response(request)
+        finally:
+            in_progress = getattr(request, 'metrics_in_progress', None)
+            if in_progress:
+                in_progress.dec()
+
+        view = getattr(request, 'metrics_view', 'unmatched')
+        method = metrics.method_label(request.method)
+        metrics.REQUESTS.labels(view, method, response.status_code).inc()
+        metrics.REQUEST_DURATION.labels(view, method).observe(
+            time.perf_counter() - start
+        )
+        metrics.REQUEST_QUERIES.labels(view).observe(
+            sum(observer.count for observer in observers)
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = timing.view_name(view_func, request)
+        request.metrics_in_progress = metrics.REQUESTS_IN_PROGRESS.labels(
+            request.metrics_view,
+            metrics.method_label(request.method),
+        )
+        request.metrics_in_progress.inc()
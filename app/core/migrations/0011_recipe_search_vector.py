@@ -0,0 +1,52 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:21
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0010_importprogress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # Same vector as recipe.search.search_vector(); filled before the
+        # index is built so the GIN index is created in one pass.
+        migrations.RunSQL(
+            sql="""
+                UPDATE core_recipe AS r SET search_vector =
+                    setweight(to_tsvector('english', r.title), 'A') ||
+                    setweight(to_tsvector('english',
+                        coalesce((
+                            SELECT string_agg(t.name, ' ')
+                            FROM core_recipe_tags AS rt
+                            JOIN core_tag AS t ON t.id = rt.tag_id
+                            WHERE rt.recipe_id = r.id
+                        ), '') || ' ' ||
+                        coalesce((
+                            SELECT string_agg(i.name, ' ')
+                            FROM core_recipe_ingredients AS ri
+                            JOIN core_ingredient AS i
+                                ON i.id = ri.ingredient_id
+                            WHERE ri.recipe_id = r.id
+                        ), '')
+                    ), 'B') ||
+                    setweight(to_tsvector('english', r.description), 'C');
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0011_recipe_search_vector'),
+    ]
+
+    # name__istartswith compiles to UPPER("name"::text) LIKE UPPER('...%');
+    # text_pattern_ops lets the prefix match use the index under any
+    # collation. Django 3.2 cannot declare opclasses on expression indexes.
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS '
+                'tag_user_upper_name_like_idx '
+                'ON core_tag (user_id, UPPER(name::text) text_pattern_ops);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS '
+                        'tag_user_upper_name_like_idx;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS '
+                'ingredient_user_upper_name_like_idx '
+                'ON core_ingredient '
+                '(user_id, UPPER(name::text) text_pattern_ops);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS '
+                        'ingredient_user_upper_name_like_idx;',
+        ),
+    ]
@@ -6,7 +6,10 @@ import uuid
 import os
 
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -75,6 +78,32 @@ class Recipe(models.Model):
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # Set on upload rather than through width_field/height_field, which
+    # would open the file whenever a row without dimensions is loaded
+    image_width = models.PositiveIntegerField(null=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, editable=False)
+    image_size = models.PositiveIntegerField(null=True, editable=False)
+    # Variant name -> storage path of the resized copies of image
+    image_variants = models.JSONField(default=dict, editable=False)
+    # Bumped on any change to the recipe or its tags/ingredients
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by recipe.search, never written through the model
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Recipe lists filter by user and order newest first
+            models.Index(
+                fields=['user', '-id'],
+                name='recipe_user_id_desc_idx',
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='recipe_search_vector_idx',
+            ),
+            # Finds the recipes using a stored image file
+            models.Index(fields=['image'], name='recipe_image_idx'),
+        ]
 
     # class method that returns str of the object
     def __str__(self):
@@ -87,6 +116,15 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-name'],
+                name='tag_user_name_desc_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -98,6 +136,103 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-name'],
+                name='ingredient_user_name_desc_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class ImageBlob(models.Model):
+    """An image file stored once per content hash and shared by recipes"""
+    content_hash = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True)
+    # Number of recipes whose image is this file
+    refcount = models.PositiveIntegerField(default=0)
+    size = models.PositiveIntegerField()
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    # Variant name -> storage path of the resized copies
+    variants = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class ImportProgress(models.Model):
+    """Number of records of an import source already committed"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    source = models.CharField(max_length=1024)
+    records_done = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'source'],
+                name='unique_import_progress_source',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.source}: {self.records_done}'
+
+
+class Job(models.Model):
+    """A call of a core.jobs task, run in the background by run_worker"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ]
+
+    # Dotted path of the task function
+    name = models.CharField(max_length=255)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+    )
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField()
+    last_error = models.TextField(blank=True)
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim the queued jobs that are due, oldest first
+            models.Index(
+                fields=['run_at'],
+                name='job_queued_run_at_idx',
+                condition=models.Q(status='queued'),
+            ),
+            # and requeue the running ones whose worker went away
+            models.Index(
+                fields=['locked_at'],
+                name='job_running_locked_at_idx',
+                condition=models.Q(status='running'),
+            ),
+        ]
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f'{self.name} ({self.status})'
@@ -0,0 +1,76 @@
+"""
+API wide renderers.
+
+orjson and msgpack are optional: without orjson JSONRenderer is DRF's
+renderer, and settings only offer MessagePack when msgpack is installed.
+"""
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """
+    DRF's JSONRenderer, encoding with orjson when installed. Values orjson
+    doesn't handle the way DRF does (Decimal, datetimes, lazy strings) go
+    through DRF's encoder, so the bytes are the same. Indented output and
+    anything orjson refuses, such as integers over 64 bits, is left to DRF.
+    """
+
+    def use_orjson(self, accepted_media_type, renderer_context):
+        return (
+            orjson is not None and
+            self.compact and
+            not self.ensure_ascii and
+            self.get_indent(accepted_media_type, renderer_context) is None
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or not self.use_orjson(
+            accepted_media_type,
+            renderer_context or {},
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME |
+                orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Like DRF, escape U+2028 and U+2029 for javascript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029',
+        )
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """
+    MessagePack for internal clients. Values without a MessagePack type
+    are encoded as DRF encodes them in JSON, so datetimes are the same
+    strings.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(
+            data,
+            default=JSONEncoder().default,
+            use_bin_type=True,
+        )
@@ -0,0 +1,193 @@
+"""
+Tests for the background job queue.
+"""
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job
+
+
+CALLS = []
+
+
+@jobs.task
+def record(*args, **kwargs):
+    CALLS.append((args, kwargs))
+
+
+@jobs.task
+def fail():
+    raise ValueError('broken')
+
+
+def not_a_task():
+    pass
+
+
+@override_settings(
+    JOB_MAX_ATTEMPTS=3,
+    JOB_RETRY_DELAY=10,
+    JOB_RETRY_MAX_DELAY=30,
+)
+class JobTests(TestCase):
+    """Test enqueuing, claiming and running jobs"""
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueue(self):
+        """Test jobs are stored with their arguments"""
+        job = jobs.enqueue(record, 1, 'two', three=3)
+
+        job.refresh_from_db()
+        self.assertEqual(job.name, 'core.tests.test_jobs.record')
+        self.assertEqual(job.args, [1, 'two'])
+        self.assertEqual(job.kwargs, {'three': 3})
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.max_attempts, 3)
+        with self.assertRaises(TypeError):
+            jobs.enqueue(not_a_task)
+
+    def test_claim(self):
+        """Test due jobs are claimed oldest first, skipping locked rows"""
+        later = jobs.enqueue(record, run_at=timezone.now() + timedelta(1))
+        second = jobs.enqueue(record)
+        first = jobs.enqueue(record, run_at=timezone.now() - timedelta(1))
+
+        with CaptureQueriesContext(connection) as queries:
+            claimed = jobs.claim('worker-1', limit=5)
+
+        self.assertEqual(claimed, [first, second])
+        self.assertTrue(any(
+            'FOR UPDATE SKIP LOCKED' in query['sql'] for query in queries
+        ))
+        second.refresh_from_db()
+        self.assertEqual(second.status, Job.RUNNING)
+        self.assertEqual(second.locked_by, 'worker-1')
+        self.assertEqual(second.attempts, 1)
+        self.assertEqual(jobs.claim('worker-2'), [])
+        later.refresh_from_db()
+        self.assertEqual(later.status, Job.QUEUED)
+
+    def test_run_job(self):
+        """Test finished jobs are deleted"""
+        jobs.enqueue(record, 1, key='value')
+
+        jobs.run_job(jobs.claim('worker')[0])
+
+        self.assertEqual(CALLS, [((1,), {'key': 'value'})])
+        self.assertFalse(Job.objects.exists())
+
+    def test_retry_with_backoff(self):
+        """Test failed jobs are retried later, then kept as failed"""
+        job = jobs.enqueue(fail)
+
+        delays = []
+        for _ in range(3):
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            before = timezone.now()
+            with self.assertLogs('core.jobs', 'WARNING'):
+                jobs.run_job(jobs.claim('worker')[0])
+            job.refresh_from_db()
+            delays.append((job.run_at - before).total_seconds())
+
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 3)
+        self.assertIn('ValueError: broken', job.last_error)
+        self.assertTrue(5 <= delays[0] <= 10.5)
+        self.assertTrue(10 <= delays[1] <= 20.5)
+
+    def test_refuses_other_callables(self):
+        """Test only task functions are run"""
+        Job.objects.create(name='os.getcwd', max_attempts=1)
+
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.run_job(jobs.claim('worker')[0])
+
+        self.assertIn('not a task', Job.objects.get().last_error)
+
+    @override_settings(JOB_TIMEOUT=60)
+    def test_requeue_stale(self):
+        """Test jobs abandoned by a dead worker are queued again"""
+        stale = jobs.enqueue(record)
+        exhausted = jobs.enqueue(record, max_attempts=1)
+        jobs.claim('worker', limit=2)
+        Job.objects.update(locked_at=timezone.now() - timedelta(minutes=5))
+        running = jobs.enqueue(record)
+        jobs.claim('worker')
+
+        self.assertEqual(jobs.requeue_stale(), 1)
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, Job.QUEUED)
+        exhausted.refresh_from_db()
+        self.assertEqual(exhausted.status, Job.FAILED)
+        running.refresh_from_db()
+        self.assertEqual(running.status, Job.RUNNING)
+
+    def test_queue_depth(self):
+        """Test jobs are counted by state"""
+        jobs.enqueue(record, run_at=timezone.now() - timedelta(seconds=30))
+        jobs.enqueue(record)
+        jobs.enqueue(record, run_at=timezone.now() + timedelta(1))
+        Job.objects.create(name='x', status=Job.FAILED, max_attempts=1)
+
+        depth = jobs.queue_depth()
+
+        self.assertEqual(depth['due'], 2)
+        self.assertEqual(depth['scheduled'], 1)
+        self.assertEqual(depth['running'], 0)
+        self.assertEqual(depth['failed'], 1)
+        self.assertGreaterEqual(depth['oldest_due_age'], 30)
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager(self):
+        """Test eager jobs run once the transaction commits"""
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.enqueue(record, 1)
+            self.assertEqual(CALLS, [])
+
+        self.assertEqual(CALLS, [((1,), {})])
+        self.assertFalse(Job.objects.exists())
+
+
+class RunWorkerTests(TransactionTestCase):
+    """Test the worker command"""
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_run_worker_burst(self):
+        """Test a burst worker runs all due jobs in its pool and exits"""
+        for value in range(5):
+            jobs.enqueue(record, value)
+        jobs.enqueue(fail, max_attempts=1)
+        out = StringIO()
+
+        with self.assertLogs('core.jobs', 'ERROR'):
+            call_command(
+                'run_worker',
+                '--burst',
+                '--concurrency', '2',
+                stdout=out,
+            )
+
+        self.assertEqual(sorted(CALLS), [((n,), {}) for n in range(5)])
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+        self.assertIn('stopped', out.getvalue())
+
+    def test_run_worker_stats(self):
+        """Test the queue depth is printed"""
+        jobs.enqueue(record)
+        out = StringIO()
+
+        call_command('run_worker', '--stats', stdout=out)
+
+        self.assertIn('due: 1', out.getvalue())
@@ -0,0 +1,179 @@
+"""
+Tests for the Prometheus metrics.
+"""
+from unittest import mock
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from prometheus_client import REGISTRY
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import jobs
+from core.tests.test_jobs import record
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+METRICS_URL = reverse('metrics')
+
+WORKER = """
+import django
+django.setup()
+from core import metrics
+metrics.REQUESTS.labels('RecipeViewSet.list', 'GET', '200').inc()
+metrics.REQUEST_DURATION.labels('RecipeViewSet.list', 'GET').observe(0.2)
+"""
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsTests(TestCase):
+    """Test requests are measured and exposed"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+        )
+
+    def test_request_metrics(self):
+        """Test requests are counted and timed by view"""
+        self.client.force_authenticate(self.user)
+        labels = {'view': 'RecipeViewSet.list', 'method': 'GET'}
+        requests = sample('api_requests_total', status='200', **labels)
+        timed = sample('api_request_duration_seconds_count', **labels)
+        queries = sample(
+            'api_request_queries_sum',
+            view='RecipeViewSet.list',
+        )
+
+        with self.assertNumQueries(2):
+            self.client.get(RECIPES_URL)
+
+        self.assertEqual(
+            sample('api_requests_total', status='200', **labels),
+            requests + 1,
+        )
+        self.assertEqual(
+            sample('api_request_duration_seconds_count', **labels),
+            timed + 1,
+        )
+        self.assertEqual(
+            sample('api_requests_in_progress', **labels),
+            0,
+        )
+        self.assertEqual(
+            sample('api_request_queries_sum', view='RecipeViewSet.list'),
+            queries + 2,
+        )
+
+    def test_bounded_labels(self):
+        """Test unknown paths and methods share one label"""
+        unmatched = sample(
+            'api_requests_total',
+            view='unmatched',
+            method='other',
+            status='404',
+        )
+
+        self.client.generic('BREW', '/api/coffee/')
+
+        self.assertEqual(
+            sample(
+                'api_requests_total',
+                view='unmatched',
+                method='other',
+                status='404',
+            ),
+            unmatched + 1,
+        )
+
+    def test_token_cache_metrics(self):
+        """Test token lookups are counted by where they were found"""
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        misses = sample('cache_requests_total', cache='tokens', result='miss')
+        hits = sample('cache_requests_total', cache='tokens', result='hit')
+
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+
+        self.assertEqual(
+            sample('cache_requests_total', cache='tokens', result='miss'),
+            misses + 1,
+        )
+        self.assertEqual(
+            sample('cache_requests_total', cache='tokens', result='hit'),
+            hits + 1,
+        )
+
+    def test_endpoint(self):
+        """Test the endpoint exposes request, database and queue state"""
+        jobs.enqueue(record)
+
+        result = self.client.get(METRICS_URL)
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertTrue(result['Content-Type'].startswith('text/plain'))
+        content = result.content.decode()
+        self.assertIn('api_request_duration_seconds_bucket', content)
+        self.assertIn('db_server_connections{state="active"}', content)
+        self.assertIn('db_server_max_connections ', content)
+        self.assertIn('job_queue_jobs{state="due"} 1.0', content)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_endpoint_token(self):
+        """Test the endpoint requires the token when one is set"""
+        result = self.client.get(METRICS_URL)
+        self.assertEqual(result.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        result = self.client.get(
+            METRICS_URL,
+            HTTP_AUTHORIZATION='Bearer secret',
+        )
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+
+    def test_multiprocess(self):
+        """Test metrics of every worker process are summed"""
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE='app.settings',
+            PROMETHEUS_MULTIPROC_DIR=path,
+        )
+        for _ in range(2):
+            subprocess.run(
+                [sys.executable, '-c', WORKER],
+                cwd=settings.BASE_DIR,
+                env=env,
+                check=True,
+            )
+
+        with mock.patch.dict(os.environ, PROMETHEUS_MULTIPROC_DIR=path):
+            result = self.client.get(METRICS_URL)
+
+        content = result.content.decode()
+        self.assertIn(
+            'api_requests_total{method="GET",status="200",'
+            'view="RecipeViewSet.list"} 2.0',
+            content,
+        )
+        self.assertIn(
+            'api_request_duration_seconds_sum{method="GET",'
+            'view="RecipeViewSet.list"} 0.4',
+            content,
+        )
+        self.assertIn('job_queue_jobs{state="due"} 0.0', content)
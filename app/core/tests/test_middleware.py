@@ -0,0 +1,134 @@
+"""
+Tests for response compression.
+"""
+from decimal import Decimal
+from unittest import skipUnless
+import gzip
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.middleware import accepted_encodings, brotli
+from core.models import Recipe
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+@override_settings(API_COMPRESSION=['br', 'gzip'])
+class CompressionTests(TestCase):
+    """Test API responses are compressed and vary on Accept-Encoding"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+        )
+        self.client.force_authenticate(self.user)
+        Recipe.objects.bulk_create(
+            Recipe(
+                user=self.user,
+                title=f'Recipe {i}',
+                time_minutes=5,
+                price=Decimal('1.00'),
+            )
+            for i in range(30)
+        )
+
+    def assertVaries(self, response):
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_accepted_encodings(self):
+        """Test refused codings and quality values are handled"""
+        self.assertEqual(
+            accepted_encodings('gzip;q=0.5, BR , deflate;q=0, x;q=bad'),
+            {'gzip', 'br'},
+        )
+        self.assertEqual(accepted_encodings(''), set())
+
+    def test_gzip(self):
+        """Test lists are gzipped with a weak ETag"""
+        plain = self.client.get(RECIPES_URL)
+
+        result = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(result['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(result.content), plain.content)
+        self.assertEqual(result['Content-Length'], str(len(result.content)))
+        self.assertEqual(result['ETag'], 'W/' + plain['ETag'])
+        self.assertVaries(result)
+        self.assertVaries(plain)
+
+    def test_conditional_get(self):
+        """Test weak ETags of compressed responses still give a 304"""
+        etag = self.client.get(
+            RECIPES_URL,
+            HTTP_ACCEPT_ENCODING='gzip',
+        )['ETag']
+
+        result = self.client.get(
+            RECIPES_URL,
+            HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=etag,
+        )
+
+        self.assertEqual(result.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertVaries(result)
+        self.assertIn('Accept', result['Vary'])
+
+    def test_left_uncompressed(self):
+        """Test short, HTML and proxy compressed responses are plain"""
+        short = self.client.get(
+            RECIPES_URL,
+            {'fields': 'id', 'page_size': 1},
+            HTTP_ACCEPT_ENCODING='gzip',
+        )
+        self.assertFalse(short.has_header('Content-Encoding'))
+        self.assertVaries(short)
+
+        html = self.client.get(
+            RECIPES_URL,
+            HTTP_ACCEPT='text/html',
+            HTTP_ACCEPT_ENCODING='gzip',
+        )
+        self.assertFalse(html.has_header('Content-Encoding'))
+
+        with override_settings(API_COMPRESSION=[]):
+            result = self.client.get(
+                RECIPES_URL,
+                HTTP_ACCEPT_ENCODING='gzip',
+            )
+        self.assertFalse(result.has_header('Content-Encoding'))
+        self.assertVaries(result)
+
+    def test_streaming(self):
+        """Test streamed exports are compressed as they are sent"""
+        result = self.client.get(EXPORT_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(result['Content-Encoding'], 'gzip')
+        self.assertFalse(result.has_header('Content-Length'))
+        lines = gzip.decompress(
+            b''.join(result.streaming_content)
+        ).splitlines()
+        self.assertEqual(len(lines), 30)
+        self.assertEqual(json.loads(lines[0])['title'], 'Recipe 29')
+
+    @skipUnless(brotli, 'brotli is not installed')
+    def test_brotli(self):
+        """Test brotli is preferred when accepted"""
+        plain = self.client.get(RECIPES_URL)
+
+        result = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(result['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(result.content), plain.content)
+
+        result = self.client.get(EXPORT_URL, HTTP_ACCEPT_ENCODING='br')
+        content = brotli.decompress(b''.join(result.streaming_content))
+        self.assertEqual(len(content.splitlines()), 30)
@@ -0,0 +1,133 @@
+"""
+Tests for the API wide renderers and parsers.
+"""
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import BytesIO
+from unittest import skipUnless
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+
+from rest_framework import parsers, renderers, status
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.parsers import JSONParser, MessagePackParser
+from core.renderers import JSONRenderer, MessagePackRenderer, msgpack
+
+
+SAMPLE = OrderedDict([
+    ('id', 1),
+    ('price', Decimal('5.50')),
+    ('created_at', datetime(2021, 5, 1, 12, 30, 15, 123456,
+                            tzinfo=timezone.utc)),
+    ('naive', datetime(2021, 5, 1, 12, 30)),
+    ('day', date(2021, 5, 1)),
+    ('at', time(8, 15, 0, 500)),
+    ('duration', timedelta(minutes=90)),
+    ('uuid', uuid.UUID(int=1)),
+    ('lazy', gettext_lazy('This field is required.')),
+    ('error', ErrorDetail('Invalid', code='invalid')),
+    ('text', 'Émincé "quoted"     \\ \n'),
+    ('nested', [{1: None, None: True}, (1.5, -0.0, 2 ** 40)]),
+    ('image', 'http://testserver/static/media/uploads/recipe/a.jpg'),
+])
+
+
+class JSONRendererTests(TestCase):
+    """Test the JSON renderer and parser match DRF's"""
+
+    def test_render_matches_drf(self):
+        """Test the rendered bytes are the same as DRF's"""
+        expected = renderers.JSONRenderer()
+        renderer = JSONRenderer()
+
+        for data in [SAMPLE, [SAMPLE], {'big': 2 ** 70}, [], None]:
+            self.assertEqual(
+                renderer.render(data),
+                expected.render(data),
+            )
+        for media_type in ['application/json; indent=4', 'application/json']:
+            self.assertEqual(
+                renderer.render(SAMPLE, media_type, {'indent': 2}),
+                expected.render(SAMPLE, media_type, {'indent': 2}),
+            )
+
+    def test_parse_matches_drf(self):
+        """Test parsed data and errors are the same as DRF's"""
+        expected = parsers.JSONParser()
+        parser = JSONParser()
+
+        for content in [
+            b'{"a": [1, 2.5, "\\u00e9", null, true], "b": {}}',
+            b'{"big": 123456789012345678901234567890}',
+            '["\\ud800", "é"]'.encode(),
+        ]:
+            self.assertEqual(
+                parser.parse(BytesIO(content)),
+                expected.parse(BytesIO(content)),
+            )
+        for content in [b'', b'{"a": NaN}', b'{"a":', b'\xef\xbb\xbf{}']:
+            with self.assertRaises(ParseError) as error:
+                expected.parse(BytesIO(content))
+            with self.assertRaises(ParseError) as result:
+                parser.parse(BytesIO(content))
+            self.assertEqual(str(result.exception), str(error.exception))
+
+
+@skipUnless(msgpack, 'msgpack is not installed')
+class MessagePackTests(TestCase):
+    """Test MessagePack requests and responses"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_round_trip(self):
+        """Test values are encoded like in JSON"""
+        sample = OrderedDict(SAMPLE, nested=[{'key': None}, (1.5, 2 ** 40)])
+        data = MessagePackParser().parse(
+            BytesIO(MessagePackRenderer().render(sample))
+        )
+
+        self.assertEqual(data['price'], 5.5)
+        self.assertEqual(data['created_at'], '2021-05-01T12:30:15.123456Z')
+        self.assertEqual(data['lazy'], 'This field is required.')
+        self.assertEqual(data['nested'], [{'key': None}, [1.5, 2 ** 40]])
+
+    def test_invalid(self):
+        """Test malformed bodies and non string keys are rejected"""
+        for content in [b'\xc1', b'\x92\x01', b'\x01\x02', b'\x81\x01\xc0']:
+            with self.assertRaises(ParseError):
+                MessagePackParser().parse(BytesIO(content))
+
+    def test_api(self):
+        """Test clients can create and list recipes in MessagePack"""
+        url = reverse('recipe:recipe-list')
+        payload = {'title': 'Soup', 'time_minutes': 10, 'price': '2.50'}
+
+        result = self.client.post(
+            url,
+            msgpack.packb(payload),
+            content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack',
+        )
+        self.assertEqual(result.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(result['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(result.content)['price'], '2.50')
+
+        result = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+        json = self.client.get(url)
+        self.assertEqual(msgpack.unpackb(result.content), json.json())
+        self.assertTrue(Recipe.objects.filter(title='Soup').exists())
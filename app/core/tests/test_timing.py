@@ -0,0 +1,134 @@
+"""
+Tests for per request timings and Server-Timing headers.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.middleware import ServerTimingMiddleware
+from core.models import Recipe, Tag
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TOKEN_URL = reverse('user:token')
+
+
+def server_timing(response):
+    """Return the Server-Timing metrics by name"""
+    metrics = {}
+    for metric in response['Server-Timing'].split(', '):
+        name, *params = metric.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+@override_settings(SERVER_TIMING=True)
+class ServerTimingTests(TestCase):
+    """Test requests are timed by part"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+        )
+        self.client.force_authenticate(self.user)
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=5,
+            price=Decimal('1.00'),
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        self.recipe = recipe
+
+    def test_list(self):
+        """Test list timings name the action and count the queries"""
+        for fast in (True, False):
+            with override_settings(RECIPE_API_FAST_LIST=fast), \
+                    CaptureQueriesContext(connection) as queries:
+                result = self.client.get(RECIPES_URL)
+
+            metrics = server_timing(result)
+            self.assertEqual(metrics['view']['desc'], '"RecipeViewSet.list"')
+            self.assertEqual(
+                metrics['db']['desc'],
+                f'"{len(queries)} queries"',
+            )
+            for name in ('total', 'view', 'db', 'serialize', 'render'):
+                self.assertGreaterEqual(float(metrics[name]['dur']), 0)
+            self.assertLessEqual(
+                float(metrics['view']['dur']),
+                float(metrics['total']['dur']),
+            )
+
+    def test_actions(self):
+        """Test detail, custom and plain API views are named"""
+        detail = reverse('recipe:recipe-detail', args=[self.recipe.id])
+        self.assertEqual(
+            server_timing(self.client.get(detail))['view']['desc'],
+            '"RecipeViewSet.retrieve"',
+        )
+        result = self.client.post(
+            reverse('recipe:recipe-upload-image', args=[self.recipe.id]),
+            {'image': 'not an image'},
+            format='multipart',
+        )
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            server_timing(result)['view']['desc'],
+            '"RecipeViewSet.upload_image"',
+        )
+
+        result = self.client.post(TOKEN_URL, {
+            'email': 'user@example.com',
+            'password': 'test123',
+        })
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        metrics = server_timing(result)
+        self.assertEqual(metrics['view']['desc'], '"CreateTokenView.post"')
+        self.assertIn('serialize', metrics)
+
+    def test_unresolved(self):
+        """Test requests not reaching a view are timed too"""
+        result = self.client.get('/api/missing/')
+
+        self.assertEqual(result.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            set(server_timing(result)),
+            {'total', 'db'},
+        )
+
+    @override_settings(SERVER_TIMING=False, SLOW_REQUEST_MS=1)
+    def test_slow_request_logged(self):
+        """Test slow requests are logged with their slowest queries"""
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            result = self.client.get(RECIPES_URL, {'page_size': 1})
+
+        self.assertFalse(result.has_header('Server-Timing'))
+        record = logs.records[0].timing
+        self.assertEqual(record['view'], 'RecipeViewSet.list')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(len(record['sql']), min(record['queries'], 5))
+        durations = [query['ms'] for query in record['sql']]
+        self.assertEqual(durations, sorted(durations, reverse=True))
+        self.assertIn('SELECT', logs.output[0])
+
+    @override_settings(SERVER_TIMING=False, SLOW_REQUEST_MS=0)
+    def test_disabled(self):
+        """Test the middleware is left out when disabled"""
+        with self.assertRaises(MiddlewareNotUsed):
+            ServerTimingMiddleware(lambda request: None)
+
+        result = self.client.get(RECIPES_URL)
+
+        self.assertFalse(result.has_header('Server-Timing'))
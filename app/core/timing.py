@@ -0,0 +1,109 @@
+"""
+Per request timings, collected by ServerTimingMiddleware.
+
+The middleware puts a RequestTiming in a context variable for the request;
+measure() and the database wrapper add to it. Serializer validation and
+representation have no hooks in DRF, so install() wraps them once when
+the middleware is enabled. Without a current RequestTiming the wrappers
+only do a context variable lookup.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+import functools
+import heapq
+import time
+
+from rest_framework import serializers
+
+
+current = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """Time spent handling a request, by part, in seconds"""
+
+    def __init__(self, keep_queries=0):
+        self.start = time.perf_counter()
+        self.view = None
+        self.view_start = None
+        self.durations = defaultdict(float, db=0.0)
+        self.active = set()
+        self.queries = 0
+        self.keep_queries = keep_queries
+        self.slowest = []
+
+    def execute(self, execute, sql, params, many, context):
+        """Database execute wrapper counting and timing the queries"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries += 1
+            self.durations['db'] += duration
+            if self.keep_queries:
+                # SQL without parameters, which can be personal data
+                query = (duration, self.queries, sql)
+                if len(self.slowest) < self.keep_queries:
+                    heapq.heappush(self.slowest, query)
+                else:
+                    heapq.heappushpop(self.slowest, query)
+
+    def slowest_queries(self):
+        """Return the slowest (seconds, sql) queries, slowest first"""
+        return [
+            (duration, sql)
+            for duration, _, sql in sorted(self.slowest, reverse=True)
+        ]
+
+
+@contextmanager
+def measure(name):
+    """Add the time spent in the block to the current request's name"""
+    timing = current.get()
+    if timing is None or name in timing.active:
+        yield
+        return
+    timing.active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.durations[name] += time.perf_counter() - start
+        timing.active.discard(name)
+
+
+def timed(name, func):
+    """Wrap func to run in measure(name)"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if current.get() is None:
+            return func(*args, **kwargs)
+        with measure(name):
+            return func(*args, **kwargs)
+    wrapper.timed = True
+    return wrapper
+
+
+def install():
+    """Time serializer validation and representation as 'serialize'"""
+    base = serializers.BaseSerializer
+    if getattr(base.is_valid, 'timed', False):
+        return
+    base.is_valid = timed('serialize', base.is_valid)
+    serializers.ListSerializer.is_valid = timed(
+        'serialize',
+        serializers.ListSerializer.is_valid,
+    )
+    base.data = property(timed('serialize', base.data.fget))
+
+
+def view_name(view_func, request):
+    """Return 'ViewClass.action' for DRF views, else the view's name"""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__name__', type(view_func).__name__)
+    method = request.method.lower()
+    action = (getattr(view_func, 'actions', None) or {}).get(method, method)
+    return f'{cls.__name__}.{action}'
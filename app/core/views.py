@@ -0,0 +1,25 @@
+"""
+Views for the core app.
+"""
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_safe
+
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from core import metrics
+
+
+@require_safe
+def metrics_view(request):
+    """Prometheus metrics, behind METRICS_TOKEN when set"""
+    if settings.METRICS_TOKEN and not constant_time_compare(
+        request.headers.get('Authorization', ''),
+        f'Bearer {settings.METRICS_TOKEN}',
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(
+        generate_latest(metrics.registry()),
+        content_type=CONTENT_TYPE_LATEST,
+    )
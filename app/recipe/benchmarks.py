@@ -0,0 +1,522 @@
+"""
+Benchmarks for the recipe APIs.
+
+Scenarios run against a freshly seeded dataset inside a transaction that
+is rolled back afterwards; see ``manage.py benchmark_recipes --help``.
+"""
+from contextlib import contextmanager
+import io
+import itertools
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count, Prefetch, Q
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from rest_framework import parsers, renderers
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.middleware import COMPRESSORS
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from core.parsers import JSONParser, MessagePackParser
+from core.renderers import JSONRenderer, MessagePackRenderer, msgpack
+from recipe.fastpath import RecipeFastSerializer
+from recipe.filters import filter_by_related
+from recipe.search import search_recipes, update_search_vectors
+from recipe.serializers import RecipeSerializer
+
+
+SCENARIOS = {}
+
+SEED_WORDS = [
+    'simmer', 'roast', 'grill', 'bake', 'whisk', 'fold', 'braise', 'sear',
+    'chop', 'dice', 'marinate', 'poach', 'steam', 'fry', 'glaze', 'toast',
+    'crispy', 'creamy', 'smoky', 'spicy', 'tangy', 'sweet', 'savory', 'rich',
+    'lemon', 'garlic', 'ginger', 'basil', 'thyme', 'cumin', 'saffron',
+    'the', 'with', 'until', 'golden', 'tender', 'gently', 'serve', 'hot',
+]
+
+
+def scenario(name):
+    """Register a benchmark scenario under name"""
+    def decorator(func):
+        SCENARIOS[name] = func
+        return func
+    return decorator
+
+
+def seed(user, recipes=1000, tags=50, ingredients=200, per_recipe=5,
+         seed_value=0):
+    """Create a dataset of recipes linked to random tags and ingredients"""
+    rand = random.Random(seed_value)
+    tag_objects = Tag.objects.bulk_create(
+        Tag(user=user, name=f'Tag {i}') for i in range(tags)
+    )
+    ingredient_objects = Ingredient.objects.bulk_create(
+        Ingredient(user=user, name=f'Ingredient {i}')
+        for i in range(ingredients)
+    )
+    recipe_objects = Recipe.objects.bulk_create(
+        Recipe(
+            user=user,
+            title=f'Recipe {i}',
+            description=' '.join(rand.choices(SEED_WORDS, k=12)),
+            time_minutes=rand.randint(5, 120),
+            price=Decimal(rand.randint(100, 9999)) / 100,
+        )
+        for i in range(recipes)
+    )
+
+    tag_links = []
+    ingredient_links = []
+    for recipe in recipe_objects:
+        for tag in rand.sample(tag_objects, min(per_recipe, tags)):
+            tag_links.append(Recipe.tags.through(recipe=recipe, tag=tag))
+        for ingredient in rand.sample(
+            ingredient_objects,
+            min(per_recipe, ingredients),
+        ):
+            ingredient_links.append(
+                Recipe.ingredients.through(
+                    recipe=recipe,
+                    ingredient=ingredient,
+                )
+            )
+    Recipe.tags.through.objects.bulk_create(tag_links, batch_size=5000)
+    Recipe.ingredients.through.objects.bulk_create(
+        ingredient_links,
+        batch_size=5000,
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'ANALYZE core_recipe, core_tag, core_ingredient, '
+            'core_recipe_tags, core_recipe_ingredients'
+        )
+        # bulk_create skips the signals maintaining search vectors
+        update_search_vectors(Recipe.objects.filter(user=user))
+        cursor.execute('ANALYZE core_recipe')
+
+    return recipe_objects, tag_objects, ingredient_objects
+
+
+def measure(func, iterations):
+    """Call func repeatedly and return the timings in milliseconds"""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+@contextmanager
+def api_client(user):
+    """Yield an API client authenticated as user"""
+    client = APIClient()
+    client.force_authenticate(user)
+    # The test client always talks to 'testserver'
+    with override_settings(ALLOWED_HOSTS=['testserver']):
+        yield client
+
+
+def report_throughput(stdout, label, count, seconds):
+    """Write a one line summary of items processed per second"""
+    stdout.write(
+        f'{label:<40} {count / seconds:10.1f} recipes/s  '
+        f'({count} in {seconds * 1000:.1f} ms)'
+    )
+
+
+def report(stdout, label, timings, extra=''):
+    """Write a one line summary of timings"""
+    stdout.write(
+        f'{label:<40} median {statistics.median(timings):8.2f} ms  '
+        f'min {min(timings):8.2f} ms  max {max(timings):8.2f} ms{extra}'
+    )
+
+
+@scenario('filters')
+def bench_filters(user, data, options, stdout):
+    """Compare JOIN + DISTINCT filtering with EXISTS semi-joins"""
+    recipes, tags, ingredients = data
+    tag_ids = [tag.id for tag in tags[:3]]
+    base = Recipe.objects.filter(user=user).defer('description', 'image')
+
+    queries = {
+        'join + distinct (any)': base.filter(
+            tags__id__in=tag_ids,
+        ).order_by('-id').distinct(),
+        'exists (any)': filter_by_related(
+            base, 'tags', tag_ids,
+        ).order_by('-id'),
+        'intersect joins (all)': _legacy_match_all(base, tag_ids),
+        'grouped semi-join (all)': filter_by_related(
+            base, 'tags', tag_ids, match_all=True,
+        ).order_by('-id'),
+    }
+
+    for label, queryset in queries.items():
+        timings = measure(lambda: list(queryset.all()), options['iterations'])
+        report(stdout, label, timings, f'  rows {queryset.count()}')
+        if options['explain']:
+            stdout.write(queryset.explain(analyze=True))
+
+
+def _legacy_match_all(queryset, ids):
+    """Match-all as it would be written with chained joins"""
+    for related_id in ids:
+        queryset = queryset.filter(tags__id=related_id)
+    return queryset.order_by('-id').distinct()
+
+
+@scenario('search')
+def bench_search(user, data, options, stdout):
+    """Compare substring matching with ranked full-text search"""
+    base = Recipe.objects.filter(user=user).defer(
+        'description',
+        'image',
+        'search_vector',
+    )
+    # 'saffron' is a common seeded word, the others match a few recipes
+    queries = {
+        'icontains title/description': base.filter(
+            Q(title__icontains='saffron') |
+            Q(description__icontains='saffron'),
+        ).order_by('-id'),
+        'full-text (word)': search_recipes(base, 'saffron').order_by(
+            '-rank', '-id',
+        ),
+        'full-text (word, first page)': search_recipes(
+            base, 'saffron',
+        ).order_by('-rank', '-id')[:20],
+        'full-text (rare words)': search_recipes(
+            base, 'recipe 4242',
+        ).order_by('-rank', '-id'),
+        'full-text (linked name)': search_recipes(
+            base, '"ingredient 17" saffron',
+        ).order_by('-rank', '-id')[:20],
+    }
+
+    for label, queryset in queries.items():
+        timings = measure(lambda: list(queryset.all()), options['iterations'])
+        report(stdout, label, timings, f'  rows {len(queryset.all())}')
+        if options['explain']:
+            stdout.write(queryset.explain(analyze=True))
+
+
+@scenario('autocomplete')
+def bench_autocomplete(user, data, options, stdout):
+    """Compare fetching every ingredient with prefix autocomplete"""
+    recipes, tags, ingredients = data
+    rand = random.Random(1)
+    names = Ingredient.objects.bulk_create(
+        (
+            Ingredient(user=user, name=f'{first} {second} {i}')
+            for first, second in itertools.product(SEED_WORDS, SEED_WORDS)
+            for i in range(14)
+        ),
+        batch_size=5000,
+    )
+    Recipe.ingredients.through.objects.bulk_create(
+        (
+            Recipe.ingredients.through(
+                recipe=recipe,
+                ingredient=ingredient,
+            )
+            for recipe in recipes
+            for ingredient in rand.sample(names, 20)
+        ),
+        batch_size=5000,
+        ignore_conflicts=True,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE core_ingredient, core_recipe_ingredients')
+
+    def suggestions(prefix):
+        return Ingredient.objects.filter(
+            user=user,
+            name__istartswith=prefix,
+        ).annotate(
+            usage=Count('recipe'),
+        ).order_by('-usage', 'name')[:10]
+
+    list_url = reverse('recipe:ingredient-list')
+    url = reverse('recipe:ingredient-autocomplete')
+    iterations = options['iterations']
+    with api_client(user) as client:
+        timings = measure(lambda: client.get(list_url), iterations)
+        report(stdout, 'full ingredient list', timings,
+               f'  rows {len(ingredients) + len(names)}')
+        for prefix in ('s', 'sa', 'saffron g'):
+            queryset = suggestions(prefix)
+            timings = measure(lambda: list(queryset.all()), iterations)
+            report(stdout, f'autocomplete query {prefix!r}', timings)
+            if options['explain']:
+                stdout.write(queryset.explain(analyze=True))
+        timings = measure(
+            lambda: client.get(url, {'prefix': 'sa'}),
+            iterations,
+        )
+        report(stdout, "autocomplete endpoint 'sa' (cached)", timings)
+
+
+@scenario('fields')
+def bench_fields(user, data, options, stdout):
+    """Compare full recipe lists with sparse fieldsets"""
+    url = reverse('recipe:recipe-list')
+    params = {
+        'full list': {},
+        'fields=id,title': {'fields': 'id,title'},
+        'fields=id,title,tags (IDs)': {'fields': 'id,title,tags'},
+        'fields=id,title,tags&expand=tags': {
+            'fields': 'id,title,tags',
+            'expand': 'tags',
+        },
+    }
+    with api_client(user) as client:
+        for label, query in params.items():
+            size = len(client.get(url, query).content)
+            timings = measure(
+                lambda: client.get(url, query),
+                options['iterations'],
+            )
+            report(stdout, label, timings, f'  {size / 1024:.0f} KiB')
+
+
+@scenario('serialize')
+def bench_serialize(user, data, options, stdout):
+    """Compare RecipeSerializer with the values() based fast path"""
+    # One full page, so the endpoint timings compare per item as well
+    count = min(len(data[0]), settings.RECIPE_API_MAX_PAGE_SIZE)
+    request = APIRequestFactory().get('/')
+    context = {'request': request}
+    queryset = Recipe.objects.filter(user=user).defer(
+        'description',
+        'search_vector',
+    ).order_by('-id')[:count]
+    prefetched = queryset.prefetch_related(
+        Prefetch('tags', queryset=Tag.objects.order_by('id')),
+        Prefetch('ingredients', queryset=Ingredient.objects.order_by('id')),
+    )
+    recipes = list(prefetched)
+    fast = RecipeFastSerializer(context)
+    rows = list(fast.values(queryset))
+    iterations = options['iterations']
+
+    def per_item(label, timings):
+        report(stdout, label, timings,
+               f'  {statistics.median(timings) * 1000 / count:.1f} us/item')
+
+    per_item('RecipeSerializer, objects loaded', measure(
+        lambda: RecipeSerializer(recipes, many=True, context=context).data,
+        iterations,
+    ))
+    per_item('fast path, rows loaded (+2 queries)', measure(
+        lambda: fast.render(rows),
+        iterations,
+    ))
+    per_item('RecipeSerializer incl. queries', measure(
+        lambda: RecipeSerializer(
+            list(prefetched.all()),
+            many=True,
+            context=context,
+        ).data,
+        iterations,
+    ))
+    per_item('fast path incl. queries', measure(
+        lambda: RecipeFastSerializer(context).render(fast.values(queryset)),
+        iterations,
+    ))
+
+    url = reverse('recipe:recipe-list')
+    with api_client(user) as client:
+        for enabled in (False, True):
+            with override_settings(RECIPE_API_FAST_LIST=enabled):
+                per_item(f'list endpoint, fast path {enabled}', measure(
+                    lambda: client.get(url, {'page_size': count}),
+                    iterations,
+                ))
+
+
+@scenario('render')
+def bench_render(user, data, options, stdout):
+    """Compare DRF's JSONRenderer with core.renderers on a full page"""
+    count = min(len(data[0]), settings.RECIPE_API_MAX_PAGE_SIZE)
+    context = {'request': APIRequestFactory().get('/')}
+    queryset = Recipe.objects.filter(user=user).order_by('-id')[:count]
+    fast = RecipeFastSerializer(context)
+    page = fast.render(fast.values(queryset))
+    candidates = [
+        ('DRF JSONRenderer', renderers.JSONRenderer()),
+        ('core JSONRenderer', JSONRenderer()),
+    ]
+    if msgpack:
+        candidates.append(('MessagePackRenderer', MessagePackRenderer()))
+    iterations = options['iterations']
+
+    for label, renderer in candidates:
+        size = len(renderer.render(page))
+        report(stdout, label, measure(
+            lambda: renderer.render(page),
+            iterations,
+        ), f'  {size} bytes')
+    for label, parser, renderer in [
+        ('DRF JSONParser', parsers.JSONParser(), JSONRenderer()),
+        ('core JSONParser', JSONParser(), JSONRenderer()),
+        *([('MessagePackParser', MessagePackParser(), MessagePackRenderer())]
+          if msgpack else []),
+    ]:
+        content = renderer.render(page)
+        report(stdout, label, measure(
+            lambda: parser.parse(io.BytesIO(content)),
+            iterations,
+        ))
+
+
+@scenario('compress')
+def bench_compress(user, data, options, stdout):
+    """Time list requests compressed by the app and their sizes"""
+    count = min(len(data[0]), settings.RECIPE_API_MAX_PAGE_SIZE)
+    url = reverse('recipe:recipe-list')
+    iterations = options['iterations']
+
+    with api_client(user) as client:
+        for coding in ['identity', *COMPRESSORS]:
+            with override_settings(API_COMPRESSION=[coding]):
+                size = len(client.get(
+                    url,
+                    {'page_size': count},
+                    HTTP_ACCEPT_ENCODING=coding,
+                ).content)
+                report(stdout, f'list endpoint, {coding}', measure(
+                    lambda: client.get(
+                        url,
+                        {'page_size': count},
+                        HTTP_ACCEPT_ENCODING=coding,
+                    ),
+                    iterations,
+                ), f'  {size} bytes')
+
+
+@scenario('bulk_create')
+def bench_bulk_create(user, data, options, stdout):
+    """Compare one POST per recipe with the bulk create endpoint"""
+    recipes, tags, ingredients = data
+    count = options['batch_size']
+
+    def payloads(prefix):
+        return [
+            {
+                'title': f'{prefix} {i}',
+                'time_minutes': 30,
+                'price': '4.50',
+                'tags': [
+                    {'name': tags[i % len(tags)].name},
+                    {'name': f'{prefix} tag {i}'},
+                ],
+                'ingredients': [
+                    {'name': ingredient.name}
+                    for ingredient in ingredients[i % 10:i % 10 + 4]
+                ],
+            }
+            for i in range(count)
+        ]
+
+    with api_client(user) as client:
+        single = payloads('Single')
+        start = time.perf_counter()
+        for payload in single:
+            client.post(reverse('recipe:recipe-list'), payload, format='json')
+        report_throughput(
+            stdout,
+            'single POST per recipe',
+            count,
+            time.perf_counter() - start,
+        )
+
+        start = time.perf_counter()
+        result = client.post(
+            reverse('recipe:recipe-bulk-create'),
+            payloads('Bulk'),
+            format='json',
+        )
+        report_throughput(
+            stdout,
+            'bulk POST',
+            len(result.data),
+            time.perf_counter() - start,
+        )
+
+
+@scenario('import')
+def bench_import(user, data, options, stdout):
+    """Compare an ORM create loop with the COPY based import command"""
+    recipes, tags, ingredients = data
+    count = options['batch_size']
+    records = [
+        {
+            'title': f'Imported {i}',
+            'time_minutes': 20,
+            'price': '3.25',
+            'tags': [tags[i % len(tags)].name, f'Imported tag {i % 50}'],
+            'ingredients': [
+                ingredient.name
+                for ingredient in ingredients[i % 10:i % 10 + 4]
+            ],
+        }
+        for i in range(count)
+    ]
+
+    start = time.perf_counter()
+    for record in records:
+        recipe = Recipe.objects.create(
+            user=user,
+            title=record['title'],
+            time_minutes=record['time_minutes'],
+            price=Decimal(record['price']),
+        )
+        for name in record['tags']:
+            tag, _ = Tag.objects.get_or_create(user=user, name=name)
+            recipe.tags.add(tag)
+        for name in record['ingredients']:
+            ingredient, _ = Ingredient.objects.get_or_create(
+                user=user,
+                name=name,
+            )
+            recipe.ingredients.add(ingredient)
+    report_throughput(
+        stdout,
+        'ORM create loop',
+        count,
+        time.perf_counter() - start,
+    )
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'recipes.ndjson')
+        with open(path, 'w', encoding='utf-8') as stream:
+            for record in records:
+                stream.write(json.dumps(record) + '\n')
+        out = io.StringIO()
+        start = time.perf_counter()
+        call_command('import_recipes', path, user=user.email, stdout=out)
+        report_throughput(
+            stdout,
+            'import_recipes (COPY)',
+            count,
+            time.perf_counter() - start,
+        )
+        stdout.write(out.getvalue().splitlines()[-1])
@@ -0,0 +1,114 @@
+"""
+Per-user versioned response cache for the recipe APIs.
+
+Cached entries are keyed by user, the user's current data version, the
+endpoint and its normalized query params. Any write to a user's recipes,
+tags or ingredients bumps the version, so stale entries are never read
+again and simply expire.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from core import metrics
+
+
+VERSION_KEY = 'recipe-api:version:{user_id}'
+
+
+class CacheStats:
+    """Thread-safe hit/miss counters for the current process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def as_dict(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    """Return the cache backend used for recipe API responses"""
+    return caches[settings.RECIPE_API_CACHE_ALIAS]
+
+
+def get_user_version(user_id):
+    """Return the current data version of a user"""
+    cache = get_cache()
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        # Versions are timestamps rather than counters, so a version that
+        # was evicted is never handed out again.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _set_user_version(user_id):
+    get_cache().set(
+        VERSION_KEY.format(user_id=user_id),
+        time.time_ns(),
+        timeout=None,
+    )
+
+
+def bump_user_version(user_id):
+    """Invalidate every cached response of a user"""
+    _set_user_version(user_id)
+    # Inside a transaction, readers may still cache the old rows under the
+    # new version until it commits, so bump once more afterwards.
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _set_user_version(user_id))
+
+
+def response_key(request, namespace):
+    """Build the cache key of a response for the requesting user"""
+    params = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+    )
+    raw = f'{request.get_host()}|{namespace}|{params}'
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    version = get_user_version(request.user.pk)
+    return f'recipe-api:{request.user.pk}:{version}:{digest}'
+
+
+def get_response_data(key):
+    """Return cached response data or None, counting hits and misses"""
+    data = get_cache().get(key)
+    stats.record(hit=data is not None)
+    metrics.CACHE_REQUESTS.labels(
+        'responses',
+        'miss' if data is None else 'hit',
+    ).inc()
+    return data
+
+
+def set_response_data(key, data, timeout=None):
+    """Store response data under key"""
+    if timeout is None:
+        timeout = settings.RECIPE_API_CACHE_TIMEOUT
+    get_cache().set(key, data, timeout)
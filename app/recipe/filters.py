@@ -0,0 +1,29 @@
+"""
+Query filters for the recipe APIs
+"""
+from django.db.models import Count, Exists, OuterRef
+
+from core.models import Recipe
+
+
+def filter_by_related(queryset, field_name, ids, match_all=False):
+    """
+    Filter recipes by the IDs of a many-to-many relation.
+
+    Works as a semi-join against the through table, so the result never
+    contains duplicates and needs no DISTINCT. With match_all only
+    recipes linked to every one of the IDs are kept.
+    """
+    field = Recipe._meta.get_field(field_name)
+    through = field.remote_field.through
+    source = field.m2m_field_name()
+    target = field.m2m_reverse_field_name()
+    links = through.objects.filter(**{f'{target}_id__in': ids})
+
+    if match_all:
+        matching = links.values(source).annotate(
+            matched=Count(target, distinct=True),
+        ).filter(matched=len(set(ids))).values(source)
+        return queryset.filter(pk__in=matching)
+
+    return queryset.filter(Exists(links.filter(**{source: OuterRef('pk')})))
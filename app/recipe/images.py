@@ -0,0 +1,269 @@
+"""
+Storage and resized variants of recipe images.
+
+Images are stored once per content hash (see ImageBlob) and shared by
+every recipe using them, so their URLs never change and can be cached
+forever. Once an upload of a new image commits, the sizes in
+RECIPE_IMAGE_VARIANTS are rendered by a background job and recorded on
+the recipes; until then serializers fall back to the original.
+"""
+import hashlib
+from io import BytesIO
+import os
+import re
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from core import jobs
+from core.models import ImageBlob, Recipe
+from recipe import cache
+
+
+EXTENSIONS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+}
+# uploads/recipe/<ab>/<sha256>[_<size>].<ext>
+CONTENT_NAME = re.compile(r'^uploads/recipe/[0-9a-f]{2}/([0-9a-f]{64})[_.]')
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def render_variants(image):
+    """
+    Return {variant: (content, extension)} for every configured size
+    smaller than image. Larger sizes are skipped, the original serves them.
+    """
+    sizes = {
+        variant: size
+        for variant, size in settings.RECIPE_IMAGE_VARIANTS.items()
+        if size < max(image.size)
+    }
+    if not sizes:
+        return {}
+
+    # Let the JPEG decoder downscale while decoding, which is much cheaper
+    # than decoding at full size; it never goes below the requested size.
+    scale = max(sizes.values()) / max(image.size)
+    image.draft('RGB', (int(image.width * scale), int(image.height * scale)))
+    image = ImageOps.exif_transpose(image)
+
+    if _has_alpha(image):
+        image_format, extension, options = 'PNG', '.png', {'optimize': True}
+        image = image.convert('RGBA')
+    else:
+        image_format, extension = 'JPEG', '.jpg'
+        options = {'quality': settings.RECIPE_IMAGE_QUALITY, 'optimize': True}
+        image = image.convert('RGB')
+
+    rendered = {}
+    # Largest first, so each variant is resized from the previous one
+    for variant, size in sorted(sizes.items(), key=lambda item: -item[1]):
+        image.thumbnail((size, size), Image.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, image_format, **options)
+        rendered[variant] = (buffer.getvalue(), extension)
+    return rendered
+
+
+def content_name(content_hash, image_format):
+    """Storage path of an image, derived from its content"""
+    extension = EXTENSIONS.get(image_format, f'.{image_format.lower()}')
+    return os.path.join(
+        'uploads',
+        'recipe',
+        content_hash[:2],
+        f'{content_hash}{extension}',
+    )
+
+
+def _describe(upload):
+    """Return the content hash, format, width and height of an upload"""
+    if getattr(upload, 'content_hash', None) is not None:
+        # Already worked out by RecipeImageUploadHandler while streaming
+        return (
+            upload.content_hash,
+            upload.image_format,
+            upload.image_width,
+            upload.image_height,
+        )
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    with Image.open(upload) as image:
+        info = (digest.hexdigest(), image.format, image.width, image.height)
+    upload.seek(0)
+    return info
+
+
+def content_hash_of(name):
+    """Return the content hash a stored file is named after, if any"""
+    match = CONTENT_NAME.match(name)
+    return match.group(1) if match else None
+
+
+def _lock_content(content_hash):
+    """
+    Serialize storing and deleting the files of one content hash until the
+    current transaction ends, so a file is never deleted as it is reused.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_advisory_xact_lock(%s)',
+            [int(content_hash[:15], 16)],
+        )
+
+
+def store_image(upload):
+    """
+    Store an uploaded image once per content and take a reference to it.
+    Uploading the same bytes again reuses the stored file and variants.
+    """
+    content_hash, image_format, width, height = _describe(upload)
+    storage = Recipe._meta.get_field('image').storage
+    with transaction.atomic():
+        _lock_content(content_hash)
+        blob, _ = ImageBlob.objects.get_or_create(
+            content_hash=content_hash,
+            defaults={
+                'name': content_name(content_hash, image_format),
+                'size': upload.size,
+                'width': width,
+                'height': height,
+            },
+        )
+        # A file left behind by a rolled back upload has the same content,
+        # one lost by a failed cleanup is stored again with fresh variants
+        if not storage.exists(blob.name):
+            storage.save(blob.name, upload)
+            blob.variants = {}
+        blob.refcount += 1
+        ImageBlob.objects.filter(pk=blob.pk).update(
+            refcount=F('refcount') + 1,
+            variants=blob.variants,
+        )
+    return blob
+
+
+def delete_content(content_hash, names=None, remove=None):
+    """
+    Delete the files named after content_hash that no recipe uses: all of
+    them once the image is unreferenced, otherwise only stale ones such as
+    variants of sizes no longer configured. names defaults to every such
+    file; each deleted name is passed to remove (storage.delete by
+    default). Returns the number of bytes reclaimed.
+    """
+    storage = Recipe._meta.get_field('image').storage
+    remove = remove or storage.delete
+    with transaction.atomic():
+        _lock_content(content_hash)
+        blob = ImageBlob.objects.filter(content_hash=content_hash).first()
+        keep = set()
+        if blob is not None and blob.refcount:
+            keep = {blob.name, *blob.variants.values()}
+        elif blob is not None:
+            blob.delete()
+        if names is None:
+            directory = os.path.dirname(content_name(content_hash, 'JPEG'))
+            names = [
+                os.path.join(directory, filename)
+                for filename in storage.listdir(directory)[1]
+                if filename.startswith(content_hash)
+            ] if storage.exists(directory) else []
+        reclaimed = 0
+        for name in names:
+            if name not in keep and storage.exists(name):
+                reclaimed += storage.size(name)
+                remove(name)
+    return reclaimed
+
+
+def delete_legacy_image(name, variants):
+    """Delete an image stored before content addressing if unused"""
+    if Recipe.objects.filter(image=name).exists():
+        return 0
+    storage = Recipe._meta.get_field('image').storage
+    reclaimed = 0
+    for path in [name, *variants.values()]:
+        if storage.exists(path):
+            reclaimed += storage.size(path)
+            storage.delete(path)
+    return reclaimed
+
+
+@jobs.task
+def cleanup_image(name, variants):
+    """Delete the files of a released image if nothing uses them"""
+    content_hash = content_hash_of(name)
+    if content_hash:
+        delete_content(content_hash)
+    else:
+        delete_legacy_image(name, variants)
+
+
+def release_image(name, variants=None):
+    """
+    Drop one reference to the stored image name and queue the deletion of
+    its files for when nothing uses them anymore
+    """
+    if not name:
+        return
+    ImageBlob.objects.filter(name=name, refcount__gt=0).update(
+        refcount=F('refcount') - 1,
+    )
+    jobs.enqueue(cleanup_image, name, dict(variants or {}))
+
+
+@jobs.task
+def generate_variants(blob_id):
+    """Render the variants of a stored image and attach them to recipes"""
+    blob = ImageBlob.objects.filter(pk=blob_id).first()
+    if blob is None:
+        return
+
+    variants = blob.variants
+    if not variants:
+        storage = Recipe._meta.get_field('image').storage
+        with storage.open(blob.name) as stream, Image.open(stream) as image:
+            rendered = render_variants(image)
+        root = os.path.splitext(blob.name)[0]
+        with transaction.atomic():
+            _lock_content(blob.content_hash)
+            if not ImageBlob.objects.filter(
+                pk=blob.pk,
+                refcount__gt=0,
+            ).exists():
+                # Released while rendering, its files are being deleted
+                return
+            for variant, (content, extension) in rendered.items():
+                size = settings.RECIPE_IMAGE_VARIANTS[variant]
+                # Named after the original's content and the size, so
+                # variant URLs are immutable as well
+                name = f'{root}_{size}{extension}'
+                if not storage.exists(name):
+                    name = storage.save(name, ContentFile(content))
+                variants[variant] = name
+            ImageBlob.objects.filter(pk=blob.pk).update(variants=variants)
+
+    recipes = Recipe.objects.filter(image=blob.name).exclude(
+        image_variants=variants,
+    )
+    user_ids = set(recipes.values_list('user_id', flat=True))
+    recipes.update(image_variants=variants, updated_at=timezone.now())
+    for user_id in user_ids:
+        cache.bump_user_version(user_id)
+
+
+def schedule_variants(blob):
+    """Queue generating the variants of a stored image"""
+    jobs.enqueue(generate_variants, blob.pk)
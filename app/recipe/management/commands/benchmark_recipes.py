@@ -0,0 +1,54 @@
+"""
+Django command to benchmark the recipe APIs on a seeded dataset
+"""
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipe import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Run a recipe API benchmark; all seeded data is rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=sorted(benchmarks.SCENARIOS))
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--per-recipe', type=int, default=5)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of recipes written by write benchmarks',
+        )
+        parser.add_argument(
+            '--explain',
+            action='store_true',
+            help='Print EXPLAIN ANALYZE output for each query',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                email=f'benchmark-{uuid.uuid4().hex}@example.com',
+            )
+            data = benchmarks.seed(
+                user,
+                recipes=options['recipes'],
+                per_recipe=options['per_recipe'],
+            )
+            self.stdout.write(
+                f"Seeded {options['recipes']} recipes, "
+                f"running '{options['scenario']}'..."
+            )
+            benchmarks.SCENARIOS[options['scenario']](
+                user,
+                data,
+                options,
+                self.stdout,
+            )
+            transaction.set_rollback(True)
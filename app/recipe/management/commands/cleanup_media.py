@@ -0,0 +1,196 @@
+"""
+Django command to delete or quarantine recipe image files nothing uses
+"""
+from collections import defaultdict
+from datetime import datetime, timezone
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from core.models import ImageBlob, Recipe
+from recipe import images
+
+
+UPLOADS_DIR = os.path.join('uploads', 'recipe')
+QUARANTINE_DIR = 'quarantine'
+
+
+def _walk(root, directory):
+    """Yield (storage name, stat) for the files below root/directory"""
+    try:
+        entries = list(os.scandir(os.path.join(root, directory)))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        name = os.path.join(directory, entry.name)
+        if entry.is_dir(follow_symlinks=False):
+            yield from _walk(root, name)
+        elif entry.is_file(follow_symlinks=False):
+            yield name.replace(os.sep, '/'), entry.stat(follow_symlinks=False)
+
+
+class Command(BaseCommand):
+    help = (
+        'Find recipe image files no recipe uses, streaming the upload '
+        'directory in batches, and delete or quarantine those older than '
+        'the grace period. Unreferenced stored images are removed as well.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours',
+            type=float,
+            default=24,
+            help='Leave files younger than this alone, they may belong to '
+                 'uploads still in progress',
+        )
+        parser.add_argument(
+            '--quarantine',
+            action='store_true',
+            help='Move orphans to MEDIA_ROOT/quarantine instead of deleting '
+                 'them; quarantined files are deleted after the grace period',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would be reclaimed',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='Keep running, starting a pass every INTERVAL seconds',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        self.storage = Recipe._meta.get_field('image').storage
+        while True:
+            self._cleanup(options)
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def _cleanup(self, options):
+        """Run one pass and report it"""
+        cutoff = time.time() - options['grace_hours'] * 3600
+        self.dry_run = options['dry_run']
+        if self.dry_run:
+            self.remove = lambda name: None
+        elif options['quarantine']:
+            self.remove = self._quarantine
+        else:
+            self.remove = self.storage.delete
+        totals = {'scanned': 0, 'recent': 0, 'orphans': 0, 'bytes': 0}
+
+        start = time.perf_counter()
+        if not self.dry_run:
+            self._release_blobs(cutoff, totals)
+        legacy_variants = self._legacy_variant_names()
+        files = _walk(self.storage.location, UPLOADS_DIR)
+        while True:
+            batch = list(islice(files, options['batch_size']))
+            if not batch:
+                break
+            self._cleanup_batch(batch, cutoff, legacy_variants, totals)
+        purged = 0
+        if options['quarantine'] and not self.dry_run:
+            purged = self._purge_quarantine(cutoff)
+
+        elapsed = time.perf_counter() - start
+        if self.dry_run:
+            action = 'would be reclaimed'
+        elif options['quarantine']:
+            action = f'quarantined, {purged} bytes purged from quarantine'
+        else:
+            action = 'reclaimed'
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {totals['scanned']} files ({totals['recent']} within "
+            f"the grace period), found {totals['orphans']} orphans: "
+            f"{totals['bytes']} bytes {action} in {elapsed:.2f}s"
+        ))
+
+    def _release_blobs(self, cutoff, totals):
+        """Delete stored images whose last reference went away"""
+        released = ImageBlob.objects.filter(
+            refcount=0,
+            created_at__lt=datetime.fromtimestamp(cutoff, timezone.utc),
+        ).values_list('content_hash', flat=True)
+        for content_hash in released.iterator():
+            totals['bytes'] += images.delete_content(
+                content_hash,
+                remove=self.remove,
+            )
+
+    def _legacy_variant_names(self):
+        """Variants of images stored before content addressing"""
+        names = set()
+        recipes = Recipe.objects.exclude(image_variants={}).exclude(
+            image__regex=images.CONTENT_NAME.pattern,
+        ).values_list('image_variants', flat=True)
+        for variants in recipes.iterator():
+            names.update(variants.values())
+        return names
+
+    def _cleanup_batch(self, batch, cutoff, legacy_variants, totals):
+        """Remove the orphans among one batch of files"""
+        totals['scanned'] += len(batch)
+        candidates = [(name, st) for name, st in batch if st.st_mtime < cutoff]
+        totals['recent'] += len(batch) - len(candidates)
+        names = [name for name, _ in candidates]
+
+        live = set(legacy_variants)
+        live.update(
+            Recipe.objects.filter(image__in=names).values_list(
+                'image',
+                flat=True,
+            )
+        )
+        hashes = {images.content_hash_of(name) for name in names} - {None}
+        blobs = ImageBlob.objects.filter(
+            content_hash__in=hashes,
+            refcount__gt=0,
+        ).values_list('name', 'variants')
+        for name, variants in blobs:
+            live.add(name)
+            live.update(variants.values())
+
+        by_hash = defaultdict(list)
+        for name, st in candidates:
+            if name in live:
+                continue
+            totals['orphans'] += 1
+            content_hash = images.content_hash_of(name)
+            if self.dry_run or not content_hash:
+                # Legacy files are never written again, no need to lock
+                totals['bytes'] += st.st_size
+                self.remove(name)
+            else:
+                by_hash[content_hash].append(name)
+        for content_hash, names in by_hash.items():
+            # Checked again under the lock, the image may be in use by now
+            totals['bytes'] += images.delete_content(
+                content_hash,
+                names,
+                remove=self.remove,
+            )
+
+    def _quarantine(self, name):
+        """Move a file out of the upload directory"""
+        target = os.path.join(self.storage.location, QUARANTINE_DIR, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(self.storage.path(name), target)
+        # The grace period in quarantine starts now
+        os.utime(target)
+
+    def _purge_quarantine(self, cutoff):
+        """Delete quarantined files older than the grace period"""
+        purged = 0
+        root = self.storage.location
+        for name, st in _walk(root, QUARANTINE_DIR):
+            if st.st_mtime < cutoff:
+                os.remove(os.path.join(root, name))
+                purged += st.st_size
+        return purged
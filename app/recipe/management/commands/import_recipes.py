@@ -0,0 +1,236 @@
+"""
+Django command to import recipes for a user with PostgreSQL COPY
+"""
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+    ImportProgress,
+)
+from recipe import cache, search
+from recipe.pgcopy import copy_objects, copy_rows, reserve_ids
+
+
+RECIPE_FIELDS = ['title', 'description', 'time_minutes', 'price', 'link']
+
+
+def _names(value):
+    """Return the tag/ingredient names of an NDJSON list or CSV cell"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(';')
+    names = [
+        item['name'] if isinstance(item, dict) else item
+        for item in value
+    ]
+    return list(dict.fromkeys(name.strip() for name in names if name.strip()))
+
+
+class Command(BaseCommand):
+    help = (
+        'Import recipes from NDJSON or CSV files (the formats produced by '
+        'the export API) for one user, loading rows with COPY in batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+')
+        parser.add_argument(
+            '--user',
+            required=True,
+            help='Email of the user who will own the recipes',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['ndjson', 'csv'],
+            help='Input format, guessed from the file extension by default',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Skip records committed by a previous, interrupted run',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+
+        self.known = {Tag: {}, Ingredient: {}}
+        totals = {'recipes': 0, 'links': 0, Tag: 0, Ingredient: 0}
+        start = time.perf_counter()
+        for path in options['paths']:
+            self._import_file(user, path, options, totals)
+
+        elapsed = time.perf_counter() - start
+        rows = totals['recipes'] + totals['links'] + \
+            totals[Tag] + totals[Ingredient]
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {totals['recipes']} recipes with {totals['links']} "
+            f"links, created {totals[Tag]} tags and {totals[Ingredient]} "
+            f"ingredients in {elapsed:.2f}s "
+            f"({rows / max(elapsed, 1e-9):.0f} rows/s)"
+        ))
+
+    def _read(self, path, fmt):
+        """Yield (line number, record dict) pairs from an input file"""
+        with open(path, newline='', encoding='utf-8') as stream:
+            if fmt == 'csv':
+                reader = csv.DictReader(stream)
+                for record in reader:
+                    yield reader.line_num, record
+                return
+            for line_no, line in enumerate(stream, start=1):
+                if line.strip():
+                    try:
+                        yield line_no, json.loads(line)
+                    except ValueError as error:
+                        raise CommandError(f'{path}:{line_no}: {error}')
+
+    def _import_file(self, user, path, options, totals):
+        """Import one file batch by batch, recording progress as we go"""
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.')
+        if fmt not in ('ndjson', 'csv'):
+            raise CommandError(f'Cannot guess the format of {path}')
+
+        progress, _ = ImportProgress.objects.get_or_create(
+            user=user,
+            source=os.path.abspath(path),
+        )
+        if not options['resume']:
+            progress.records_done = 0
+            progress.save()
+        elif progress.records_done:
+            self.stdout.write(
+                f'{path}: resuming after {progress.records_done} records'
+            )
+
+        records = islice(self._read(path, fmt), progress.records_done, None)
+        start = time.perf_counter()
+        imported = 0
+        while True:
+            batch = list(islice(records, options['batch_size']))
+            if not batch:
+                break
+            self._import_batch(user, path, batch, progress, totals)
+            imported += len(batch)
+            rate = imported / max(time.perf_counter() - start, 1e-9)
+            self.stdout.write(
+                f'{path}: {progress.records_done} records done '
+                f'({rate:.0f} recipes/s)'
+            )
+
+    def _parse(self, user, path, line_no, record):
+        """Build an unsaved recipe and its tag/ingredient names"""
+        recipe = Recipe(user=user, **{
+            field: record[field] for field in RECIPE_FIELDS
+            if record.get(field) not in (None, '')
+        })
+        try:
+            recipe.clean_fields(exclude=['user', 'image'])
+        except ValidationError as error:
+            raise CommandError(f'{path}:{line_no}: {error.message_dict}')
+
+        tags = _names(record.get('tags'))
+        ingredients = _names(record.get('ingredients'))
+        for name in tags + ingredients:
+            if len(name) > 255:
+                raise CommandError(f'{path}:{line_no}: name too long')
+        return recipe, tags, ingredients
+
+    def _resolve(self, model, user, names, created):
+        """
+        Map names to IDs, COPYing the missing objects. New names are
+        collected in created and only remembered once the batch commits.
+        """
+        known = self.known[model]
+        unknown = [name for name in dict.fromkeys(names) if name not in known]
+        ids = dict(
+            model.objects.filter(
+                user=user,
+                name__in=unknown,
+            ).order_by('-id').values_list('name', 'id')
+        )
+        missing = [name for name in unknown if name not in ids]
+        objs = [
+            model(id=pk, user=user, name=name)
+            for pk, name in zip(reserve_ids(model, len(missing)), missing)
+        ]
+        copy_objects(objs)
+        created.update((obj.name, obj.id) for obj in objs)
+        ids.update(created)
+        return {**known, **ids}
+
+    def _link(self, field_name, recipes, names, ids):
+        """COPY the through rows linking recipes to tags/ingredients"""
+        field = Recipe._meta.get_field(field_name)
+        through = field.remote_field.through
+        rows = [
+            (recipe.id, ids[name])
+            for recipe, recipe_names in zip(recipes, names)
+            for name in recipe_names
+        ]
+        copy_rows(
+            through._meta.db_table,
+            [
+                through._meta.get_field(field.m2m_field_name()).column,
+                through._meta.get_field(field.m2m_reverse_field_name()).column,
+            ],
+            rows,
+        )
+        return len(rows)
+
+    def _import_batch(self, user, path, batch, progress, totals):
+        """Load one batch of records in a single transaction"""
+        parsed = [self._parse(user, path, *item) for item in batch]
+        recipes = [recipe for recipe, _, _ in parsed]
+        tags = [names for _, names, _ in parsed]
+        ingredients = [names for _, _, names in parsed]
+        created = {Tag: {}, Ingredient: {}}
+
+        with transaction.atomic():
+            tag_ids = self._resolve(
+                Tag,
+                user,
+                [name for names in tags for name in names],
+                created[Tag],
+            )
+            ingredient_ids = self._resolve(
+                Ingredient,
+                user,
+                [name for names in ingredients for name in names],
+                created[Ingredient],
+            )
+            for recipe, pk in zip(recipes, reserve_ids(Recipe, len(recipes))):
+                recipe.id = pk
+            copy_objects(recipes)
+            links = self._link('tags', recipes, tags, tag_ids)
+            links += self._link(
+                'ingredients', recipes, ingredients, ingredient_ids,
+            )
+            search.update_search_vectors(
+                Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes])
+            )
+            progress.records_done += len(batch)
+            progress.save()
+            cache.bump_user_version(user.pk)
+
+        for model in (Tag, Ingredient):
+            self.known[model].update(created[model])
+            totals[model] += len(created[model])
+        totals['recipes'] += len(recipes)
+        totals['links'] += links
@@ -0,0 +1,218 @@
+"""
+View mixins for the recipe APIs
+"""
+from calendar import timegm
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Max, Prefetch
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from core import timing
+from recipe import cache
+
+
+class ConditionalGetMixin:
+    """
+    Answer If-None-Match/If-Modified-Since with 304 for list requests,
+    using validators computed from one aggregate query over the objects
+    in the response instead of the rendered body. Lists get no
+    Last-Modified, as deleting an object does not move it forward.
+    """
+
+    def _get_validators(self, request, queryset):
+        """Return the quoted ETag, Last-Modified timestamp and row count"""
+        state = queryset.order_by().aggregate(
+            count=Count('pk'),
+            last_modified=Max('updated_at'),
+        )
+        last_modified = state['last_modified']
+        params = sorted(request.query_params.lists())
+        raw = '|'.join(str(part) for part in (
+            request.user.pk,
+            request.get_host(),
+            request.path,
+            params,
+            request.accepted_renderer.format,
+            state['count'],
+            last_modified.isoformat() if last_modified else '',
+        ))
+        etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+        timestamp = None
+        if last_modified and self.action != 'list':
+            timestamp = timegm(last_modified.utctimetuple())
+            # HTTP dates have one second precision, so a later write in
+            # the same second would not change the date
+            if timestamp >= int(time.time()):
+                timestamp = None
+        return etag, timestamp, state['count']
+
+    def _conditional_response(self, request, queryset, get_response):
+        """Return a 304 if the client is up to date, else get_response()"""
+        etag, last_modified, count = self._get_validators(request, queryset)
+        response = None
+        if count or self.action == 'list':
+            response = get_conditional_response(
+                request,
+                etag=etag,
+                last_modified=last_modified,
+            )
+        if response is None:
+            response = get_response()
+
+        if response.status_code in (
+            status.HTTP_200_OK,
+            status.HTTP_304_NOT_MODIFIED,
+        ):
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, ['Accept', 'Authorization'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self._conditional_response(
+            request,
+            queryset,
+            lambda: super(ConditionalGetMixin, self).list(
+                request, *args, **kwargs
+            ),
+        )
+
+
+class ConditionalRetrieveMixin(ConditionalGetMixin):
+    """Conditional GET support for detail requests as well as lists"""
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        return self._conditional_response(
+            request,
+            queryset,
+            lambda: super(ConditionalGetMixin, self).retrieve(
+                request, *args, **kwargs
+            ),
+        )
+
+
+class CachedListMixin:
+    """Serve list responses from the per-user versioned cache"""
+
+    def list(self, request, *args, **kwargs):
+        if not settings.RECIPE_API_CACHE_ENABLED:
+            return super().list(request, *args, **kwargs)
+
+        key = cache.response_key(request, f'{self.basename}-list')
+        data = cache.get_response_data(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set_response_data(key, response.data)
+        return response
+
+
+class SparseFieldsetMixin:
+    """
+    Let list and detail requests choose fields with ?fields=a,b, and
+    relations rendered as objects rather than IDs with ?expand=c. Only the
+    columns and relations the chosen fields read are loaded. Serializers
+    must use serializers.SparseFieldsMixin.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def _list_param(self, name):
+        value = self.request.query_params.get(name)
+        if value is None:
+            return None
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    def get_sparse_fields(self):
+        """Return the requested fields (None for all) and expansions"""
+        if self.action not in self.sparse_actions:
+            return None, []
+        serializer_class = self.get_serializer_class()
+        fields = self._list_param('fields')
+        expand = self._list_param('expand') or []
+        errors = {}
+        available = serializer_class.Meta.fields
+        if fields is not None and (
+            not fields or set(fields) - set(available)
+        ):
+            errors['fields'] = f"Choose from {', '.join(available)}."
+        expandable = serializer_class.expandable_fields
+        if set(expand) - set(expandable):
+            errors['expand'] = f"Choose from {', '.join(expandable)}." \
+                if expandable else 'Nothing can be expanded.'
+        if errors:
+            raise ValidationError(errors)
+        return fields, expand
+
+    def sparse_queryset(self, queryset, fields, expand):
+        """Load only what the requested fields read"""
+        serializer_class = self.get_serializer_class()
+        opts = queryset.model._meta
+        # The key and ordering columns are needed to build cursors
+        columns = [opts.pk.name]
+        for name in queryset.query.order_by:
+            try:
+                columns.append(opts.get_field(name.lstrip('-')).name)
+            except FieldDoesNotExist:
+                pass
+
+        prefetches = []
+        for name in fields:
+            for source in serializer_class.field_sources.get(name, [name]):
+                field = opts.get_field(source)
+                if not field.many_to_many:
+                    columns.append(field.name)
+                    continue
+                nested = serializer_class._declared_fields[name].child
+                related = field.related_model.objects.only(
+                    *(nested.Meta.fields if name in expand else ['pk'])
+                ).order_by('pk')
+                prefetches.append(Prefetch(source, queryset=related))
+        return queryset.only(*columns).prefetch_related(*prefetches)
+
+    def get_serializer(self, *args, **kwargs):
+        fields, expand = self.get_sparse_fields()
+        if fields is not None:
+            kwargs.update(fields=fields, expand=expand)
+        return super().get_serializer(*args, **kwargs)
+
+
+class FastListMixin:
+    """
+    Render list responses with fast_list_class from values() rows rather
+    than through the list serializer. Goes with SparseFieldsetMixin.
+    """
+    fast_list_class = None
+
+    def list(self, request, *args, **kwargs):
+        if not settings.RECIPE_API_FAST_LIST:
+            return super().list(request, *args, **kwargs)
+
+        fields, expand = self.get_sparse_fields()
+        fast = self.fast_list_class(
+            self.get_serializer_context(),
+            fields,
+            expand,
+        )
+        queryset = fast.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        with timing.measure('serialize'):
+            data = fast.render(queryset if page is None else page)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -0,0 +1,43 @@
+"""
+Pagination for the recipe APIs
+"""
+from django.conf import settings
+
+from rest_framework.pagination import CursorPagination
+
+
+class OptInCursorPagination(CursorPagination):
+    """
+    Keyset pagination, only applied when the client sends a cursor or a
+    page size so existing clients keep receiving plain lists.
+    """
+    page_size_query_param = 'page_size'
+
+    def __init__(self):
+        self.page_size = settings.RECIPE_API_PAGE_SIZE
+        self.max_page_size = settings.RECIPE_API_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Paginate only when pagination was requested"""
+        params = request.query_params
+        if (self.cursor_query_param not in params and
+                self.page_size_query_param not in params):
+            return None
+
+        return super().paginate_queryset(queryset, request, view)
+
+
+class RecipeCursorPagination(OptInCursorPagination):
+    """Cursor pagination for recipes, newest first"""
+    ordering = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        """Page search results by rank, ties broken newest first"""
+        if request.query_params.get('search', '').strip():
+            return ('-rank', '-id')
+        return super().get_ordering(request, queryset, view)
+
+
+class RecipeAttrCursorPagination(OptInCursorPagination):
+    """Cursor pagination for tags and ingredients"""
+    ordering = '-name'
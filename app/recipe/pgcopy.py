@@ -0,0 +1,77 @@
+"""
+Helpers to load rows into PostgreSQL with COPY
+"""
+import io
+
+from django.db import connection
+from psycopg2.extras import Json
+
+
+def _copy_value(value):
+    """Encode a value for COPY's text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, Json):
+        # JSONField values arrive wrapped in an SQL literal adapter
+        value = value.dumps(value.adapted)
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
+def reserve_ids(model, count):
+    """Draw count primary keys from the sequence of a model's table"""
+    if not count:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+            'FROM generate_series(1, %s)',
+            [model._meta.db_table, model._meta.pk.column, count],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def copy_rows(table, columns, rows):
+    """COPY rows (sequences of Python values) into table"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    quote = connection.ops.quote_name
+    sql = 'COPY {} ({}) FROM STDIN'.format(
+        quote(table),
+        ', '.join(quote(column) for column in columns),
+    )
+    with connection.cursor() as cursor:
+        cursor.copy_expert(sql, buffer)
+
+
+def copy_objects(objs):
+    """
+    COPY unsaved model instances that already have a primary key.
+
+    Values go through the same pre_save/get_db_prep_save conversion as a
+    regular save, so defaults and auto_now fields are filled in.
+    """
+    if not objs:
+        return
+    meta = type(objs[0])._meta
+    fields = meta.concrete_fields
+    copy_rows(
+        meta.db_table,
+        [field.column for field in fields],
+        (
+            [
+                field.get_db_prep_save(field.pre_save(obj, True), connection)
+                for field in fields
+            ]
+            for obj in objs
+        ),
+    )
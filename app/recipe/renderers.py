@@ -0,0 +1,50 @@
+"""
+Renderers for the recipe export API
+"""
+import csv
+import io
+import json
+
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """Newline delimited JSON, one object per line"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render_lines(self, items):
+        """Return the NDJSON text for an iterable of dicts"""
+        return ''.join(
+            json.dumps(item, cls=JSONEncoder, ensure_ascii=False) + '\n'
+            for item in items
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        return self.render_lines(items).encode(self.charset)
+
+
+class CSVRenderer(renderers.BaseRenderer):
+    """Comma separated values with a header row"""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render_rows(self, rows):
+        """Return the CSV text for an iterable of row lists"""
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        rows = [list(items[0].keys())] if items else []
+        rows += [list(item.values()) for item in items]
+        return self.render_rows(rows).encode(self.charset)
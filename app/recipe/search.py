@@ -0,0 +1,63 @@
+"""
+Full-text search over recipes.
+
+Each recipe stores a tsvector of its title, tag and ingredient names and
+description. It is kept up to date by the signal handlers and by the bulk
+write paths, which bypass signals and call ``update_search_vectors``.
+"""
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db.models import F, FloatField, OuterRef, Subquery
+from django.db.models.functions import Cast
+
+from core.models import Recipe
+
+
+SEARCH_CONFIG = 'english'
+
+
+def _related_names(field_name):
+    """Subquery joining the names linked to the outer recipe"""
+    field = Recipe._meta.get_field(field_name)
+    through = field.remote_field.through
+    target = field.m2m_reverse_field_name()
+    return Subquery(
+        through.objects.filter(
+            recipe_id=OuterRef('pk'),
+        ).values('recipe_id').annotate(
+            names=StringAgg(f'{target}__name', ' '),
+        ).values('names')
+    )
+
+
+def search_vector():
+    """Expression computing the search vector of a recipe"""
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+        SearchVector(
+            _related_names('tags'),
+            _related_names('ingredients'),
+            weight='B',
+            config=SEARCH_CONFIG,
+        ) +
+        SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset):
+    """Recompute the search vectors of the recipes in queryset"""
+    queryset.update(search_vector=search_vector())
+
+
+def search_recipes(queryset, text):
+    """Filter queryset to recipes matching text, annotated with a rank"""
+    query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+    return queryset.filter(search_vector=query).annotate(
+        # ts_rank is a real; as a double precision it compares equal to the
+        # float the pagination cursor stores
+        rank=Cast(SearchRank(F('search_vector'), query), FloatField()),
+    )
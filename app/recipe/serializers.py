@@ -1,17 +1,49 @@
 """
 Serializers for recipe APIs
 """
+from django.conf import settings
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 
 from core.models import (
     Recipe,
     Tag,
     Ingredient,
     )
+from recipe import cache, images, search
+
+
 
+class SparseFieldsMixin:
+    """
+    Render only the serializer fields passed as fields (from ?fields=,
+    see mixins.SparseFieldsetMixin). The relations in expandable_fields
+    are then rendered as lists of IDs unless they are passed in expand.
+    """
+    expandable_fields = []
+    # Model fields read by serializer fields not named after one
+    field_sources = {}
 
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None:
+            return
+        for name in set(self.fields) - set(fields):
+            self.fields.pop(name)
+        for name in self.expandable_fields:
+            if name in self.fields and name not in expand:
+                self.fields[name] = serializers.PrimaryKeyRelatedField(
+                    many=True,
+                    read_only=True,
+                )
 
-class IngredientSerializer(serializers.ModelSerializer):
+
+class IngredientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Serializer for Ingredient """
 
     class Meta:
@@ -20,7 +52,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Serializer for tags """
 
     class Meta:
@@ -29,35 +61,160 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+@extend_schema_field(OpenApiTypes.OBJECT)
+class ImageVariantsField(serializers.Field):
+    """
+    URLs of the resized copies of a recipe image, falling back to the
+    original until the variants have been generated
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        return image_variant_urls(
+            self.context.get('request'),
+            recipe.image.name,
+            recipe.image_variants,
+        )
+
+
+def image_variant_urls(request, name, variants):
+    """Return the URL of every image variant, None without an image"""
+    if not name:
+        return None
+    storage = Recipe._meta.get_field('image').storage
+    urls = {}
+    for variant in settings.RECIPE_IMAGE_VARIANTS:
+        url = storage.url(variants.get(variant, name))
+        urls[variant] = request.build_absolute_uri(url) \
+            if request is not None else url
+    return urls
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Create many recipes at once using bulk inserts"""
+
+    def to_internal_value(self, data):
+        """Limit the number of recipes before validating any of them"""
+        max_items = settings.RECIPE_API_BULK_MAX_ITEMS
+        if isinstance(data, list) and len(data) > max_items:
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    f'Ensure this list has at most {max_items} items.'
+                ],
+            }, code='max_length')
+        return super().to_internal_value(data)
+
+    def _link(self, recipes, nested, field_name, objects):
+        """Build the through rows linking recipes to resolved objects"""
+        field = Recipe._meta.get_field(field_name)
+        through = field.remote_field.through
+        target = f'{field.m2m_reverse_field_name()}_id'
+        return [
+            through(recipe_id=recipe.pk, **{target: objects[name].pk})
+            for recipe, items in zip(recipes, nested)
+            for name in dict.fromkeys(item['name'] for item in items)
+        ]
+
+    def create(self, validated_data):
+        """Create recipes, tags, ingredients and links in a few queries"""
+        tags = [item.pop('tags', []) for item in validated_data]
+        ingredients = [item.pop('ingredients', []) for item in validated_data]
+        recipes = Recipe.objects.bulk_create(
+            Recipe(**item) for item in validated_data
+        )
+
+        tag_objects = self.child._resolve_attrs(
+            Tag,
+            [tag for items in tags for tag in items],
+        )
+        ingredient_objects = self.child._resolve_attrs(
+            Ingredient,
+            [ingredient for items in ingredients for ingredient in items],
+        )
+        Recipe.tags.through.objects.bulk_create(
+            self._link(recipes, tags, 'tags', tag_objects)
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            self._link(recipes, ingredients, 'ingredients', ingredient_objects)
+        )
+        prefetch_related_objects(recipes, 'tags', 'ingredients')
+
+        # bulk_create skips the signals that normally reindex recipes and
+        # invalidate caches
+        if recipes:
+            search.update_search_vectors(
+                Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes])
+            )
+            cache.bump_user_version(recipes[0].user_id)
+
+        return recipes
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for recipes"""
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required = False)
+    image_variants = ImageVariantsField()
+
+    expandable_fields = ['tags', 'ingredients']
+    field_sources = {'image_variants': ['image', 'image_variants']}
 
     class Meta:
         model = Recipe
-        fields = ['id', 'title', 'time_minutes', 'price', 'link', 'tags', 'ingredients',]
+        fields = [
+            'id', 'title', 'time_minutes', 'price', 'link', 'tags',
+            'ingredients', 'image_variants',
+        ]
         read_only_fields = ['id']
+        list_serializer_class = RecipeListSerializer
+
+    def _resolve_attrs(self, model, items):
+        """
+        Map item names to objects, creating the missing ones in one batch
+        """
+        if not items:
+            return {}
+        auth_user = self.context['request'].user
+        names = list(dict.fromkeys(item['name'] for item in items))
+        objects = {}
+        existing = model.objects.filter(
+            user=auth_user,
+            name__in=names,
+        ).order_by('id')
+        for obj in existing:
+            objects.setdefault(obj.name, obj)
+
+        missing = [
+            model(user=auth_user, name=name)
+            for name in names if name not in objects
+        ]
+        for obj in model.objects.bulk_create(missing):
+            objects[obj.name] = obj
+
+        return objects
+
+    def _get_or_create_attrs(self, model, items):
+        """Resolve items by name, creating the missing ones in one batch"""
+        objects = self._resolve_attrs(model, items)
+        return [objects[name] for name in dict.fromkeys(
+            item['name'] for item in items
+        )]
 
     def _get_or_create_tags(self, tags, recipe):
         """Handle getting or creating tags as needed"""
-        auth_user = self.context['request'].user
-        for tag in tags:
-            tag_object, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            recipe.tags.add(tag_object)
+        tag_objects = self._get_or_create_attrs(Tag, tags)
+        if tag_objects:
+            recipe.tags.add(*tag_objects)
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         """ Handle getting or creating ingredients as needed"""
-        auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_object, created = Ingredient.objects.get_or_create(
-                user = auth_user,
-                **ingredient,
-            )
-            recipe.ingredients.add(ingredient_object)
+        ingredient_objects = self._get_or_create_attrs(Ingredient, ingredients)
+        if ingredient_objects:
+            recipe.ingredients.add(*ingredient_objects)
 
     def create(self, validated_data):
         """Create a recipe"""
@@ -73,13 +230,14 @@ class RecipeSerializer(serializers.ModelSerializer):
         """Update recipe"""
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
+        # set() only deletes/inserts the links that actually changed
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+            instance.tags.set(self._get_or_create_attrs(Tag, tags))
 
         if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+            instance.ingredients.set(
+                self._get_or_create_attrs(Ingredient, ingredients)
+            )
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -94,11 +252,49 @@ class RecipeDetailSerializer(RecipeSerializer):
         fields = RecipeSerializer.Meta.fields + ['description', 'image']
 
 
+class UploadedImageField(serializers.ImageField):
+    """
+    Image field that trusts the header checks of RecipeImageUploadHandler
+    instead of opening and verifying the whole image once more
+    """
+
+    def to_internal_value(self, data):
+        if getattr(data, 'image_format', None) is None:
+            return super().to_internal_value(data)
+        return serializers.FileField.to_internal_value(self, data)
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images to recipes."""
+    image = UploadedImageField(
+        max_length=Recipe._meta.get_field('image').max_length,
+    )
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ['id', 'image']
-        read_only_fields = ['id']
-        extra_kwargs = {'image': {'required': 'True'}}
\ No newline at end of file
+        fields = [
+            'id',
+            'image',
+            'image_width',
+            'image_height',
+            'image_size',
+            'image_variants',
+        ]
+        read_only_fields = ['id', 'image_width', 'image_height', 'image_size']
+
+    def update(self, instance, validated_data):
+        """Point the recipe at the shared copy of the uploaded image"""
+        with transaction.atomic():
+            blob = images.store_image(validated_data.pop('image'))
+            previous = instance.image.name, instance.image_variants
+            instance.image = blob.name
+            instance.image_width = blob.width
+            instance.image_height = blob.height
+            instance.image_size = blob.size
+            instance.image_variants = blob.variants
+            instance = super().update(instance, validated_data)
+            images.release_image(*previous)
+        if not blob.variants:
+            images.schedule_variants(blob)
+        return instance
@@ -0,0 +1,109 @@
+"""
+Signal handlers for the recipe APIs
+"""
+from django.db.models.signals import (
+    post_save,
+    post_delete,
+    pre_delete,
+    m2m_changed,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe import cache, images, search
+
+
+def touch(queryset):
+    """Mark objects as modified without firing save signals"""
+    fields = {'updated_at': timezone.now()}
+    if queryset.model is Recipe:
+        # Recipe search vectors include tag and ingredient names
+        fields['search_vector'] = search.search_vector()
+    queryset.update(**fields)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """Invalidate cached responses of the owner of a changed object"""
+    cache.bump_user_version(instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, update_fields=None,
+                                **kwargs):
+    """Reindex a saved recipe unless only unsearched fields changed"""
+    if update_fields is None or {'title', 'description'} & set(update_fields):
+        search.update_search_vectors(
+            Recipe.objects.filter(pk=instance.pk)
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_image(sender, instance, **kwargs):
+    """Drop the deleted recipe's reference to its stored image"""
+    images.release_image(instance.image.name, instance.image_variants)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def touch_recipes_of_attr(sender, instance, created=False, **kwargs):
+    """Recipes embed tag/ingredient names, so they change along with them"""
+    if not created:
+        touch(instance.recipe_set.all())
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_recipes_of_attr(sender, instance, **kwargs):
+    """Links are gone by post_delete, so note the recipes beforehand"""
+    instance._linked_recipe_ids = list(
+        instance.recipe_set.values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def touch_recipes_of_deleted_attr(sender, instance, **kwargs):
+    """Touch the recipes a deleted tag/ingredient was linked to"""
+    recipe_ids = instance.__dict__.pop('_linked_recipe_ids', [])
+    if recipe_ids:
+        touch(Recipe.objects.filter(pk__in=recipe_ids))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def track_link_changes(sender, instance, action, reverse, model, pk_set,
+                       **kwargs):
+    """Touch both sides of changed recipe links and invalidate caches"""
+    if action == 'pre_clear':
+        # clear() does not report which objects were unlinked
+        field = next(
+            f for f in Recipe._meta.many_to_many
+            if f.remote_field.through is sender
+        )
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        if reverse:
+            source, target = target, source
+        # Touched on post_clear, once search vectors can drop the links
+        instance._cleared_pk_set = list(sender.objects.filter(
+            **{source: instance.pk}
+        ).values_list(f'{target}_id', flat=True))
+        return
+
+    if action == 'post_clear':
+        pk_set = instance.__dict__.pop('_cleared_pk_set', [])
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        touch(model.objects.filter(pk__in=pk_set))
+        touch(type(instance).objects.filter(pk=instance.pk))
+        cache.bump_user_version(instance.user_id)
@@ -0,0 +1,135 @@
+"""
+Tests for the tag and ingredient autocomplete APIs.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache as default_cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+TAGS_AUTOCOMPLETE_URL = reverse('recipe:tag-autocomplete')
+INGREDIENTS_AUTOCOMPLETE_URL = reverse('recipe:ingredient-autocomplete')
+
+
+class PublicAutocompleteApiTests(TestCase):
+    """Test unauthenticated autocomplete requests"""
+
+    def test_auth_required(self):
+        """Test auth is required for autocomplete"""
+        result = APIClient().get(TAGS_AUTOCOMPLETE_URL, {'prefix': 'a'})
+
+        self.assertEqual(result.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateAutocompleteApiTests(TestCase):
+    """Test authenticated autocomplete requests"""
+
+    def setUp(self):
+        default_cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, tags=(), ingredients=()):
+        """Create a recipe linked to the given tags and ingredients"""
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=5,
+            price=Decimal('1.00'),
+        )
+        recipe.tags.add(*tags)
+        recipe.ingredients.add(*ingredients)
+        return recipe
+
+    def names(self, url, **params):
+        """Return the suggested names"""
+        result = self.client.get(url, params)
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        return [item['name'] for item in result.data]
+
+    def test_autocomplete_tags(self):
+        """Test matching prefixes case-insensitively, most used first"""
+        soup = Tag.objects.create(user=self.user, name='Soup')
+        sour = Tag.objects.create(user=self.user, name='sour')
+        Tag.objects.create(user=self.user, name='Sous vide')
+        Tag.objects.create(user=self.user, name='Dessert')
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='test123',
+        )
+        Tag.objects.create(user=other, name='Soul food')
+        self.create_recipe(tags=[sour])
+        self.create_recipe(tags=[sour, soup])
+        self.create_recipe(tags=[soup])
+        self.create_recipe(tags=[sour])
+
+        self.assertEqual(
+            self.names(TAGS_AUTOCOMPLETE_URL, prefix='SOU'),
+            ['sour', 'Soup', 'Sous vide'],
+        )
+        self.assertEqual(
+            self.names(TAGS_AUTOCOMPLETE_URL, prefix='sou', limit=2),
+            ['sour', 'Soup'],
+        )
+        self.assertEqual(self.names(TAGS_AUTOCOMPLETE_URL, prefix='%'), [])
+
+    def test_autocomplete_ingredients(self):
+        """Test ingredient suggestions"""
+        Ingredient.objects.create(user=self.user, name='Salt')
+        Ingredient.objects.create(user=self.user, name='Sugar')
+
+        self.assertEqual(
+            self.names(INGREDIENTS_AUTOCOMPLETE_URL, prefix='sa'),
+            ['Salt'],
+        )
+
+    def test_autocomplete_invalid_params(self):
+        """Test a prefix is required and the limit must be a number"""
+        result = self.client.get(TAGS_AUTOCOMPLETE_URL)
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+
+        result = self.client.get(
+            TAGS_AUTOCOMPLETE_URL,
+            {'prefix': 'a', 'limit': 'many'},
+        )
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_autocomplete_cached(self):
+        """Test suggestions are cached until the user's data changes"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        self.assertEqual(
+            self.names(TAGS_AUTOCOMPLETE_URL, prefix='ve'),
+            ['Vegan'],
+        )
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.names(TAGS_AUTOCOMPLETE_URL, prefix='ve'),
+                ['Vegan'],
+            )
+
+        Tag.objects.create(user=self.user, name='Vegetarian')
+        self.assertEqual(
+            self.names(TAGS_AUTOCOMPLETE_URL, prefix='ve'),
+            ['Vegan', 'Vegetarian'],
+        )
+
+    @override_settings(RECIPE_API_AUTOCOMPLETE_CACHE_TIMEOUT=0)
+    def test_autocomplete_cache_disabled(self):
+        """Test a zero timeout always queries the database"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        self.names(TAGS_AUTOCOMPLETE_URL, prefix='ve')
+
+        with self.assertNumQueries(1):
+            self.names(TAGS_AUTOCOMPLETE_URL, prefix='ve')
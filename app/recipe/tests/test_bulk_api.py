@@ -0,0 +1,141 @@
+"""
+Tests for the bulk recipe create API.
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+from recipe import cache
+from recipe.serializers import RecipeSerializer
+
+
+BULK_URL = reverse('recipe:recipe-bulk-create')
+
+
+def recipe_payload(index, tags=(), ingredients=()):
+    """Return a recipe payload for the bulk endpoint"""
+    return {
+        'title': f'Recipe {index}',
+        'time_minutes': 10 + index,
+        'price': '5.50',
+        'tags': [{'name': name} for name in tags],
+        'ingredients': [{'name': name} for name in ingredients],
+    }
+
+
+class PublicBulkApiTests(TestCase):
+    """Test unauthenticated bulk requests"""
+
+    def test_auth_required(self):
+        """Test auth is required to bulk create recipes"""
+        result = APIClient().post(BULK_URL, [], format='json')
+
+        self.assertEqual(result.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateBulkApiTests(TestCase):
+    """Test authenticated bulk requests"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create(self):
+        """Test creating several recipes with shared nested items"""
+        Tag.objects.create(user=self.user, name='Dinner')
+        payload = [
+            recipe_payload(0, tags=['Dinner', 'Thai'], ingredients=['Rice']),
+            recipe_payload(1, tags=['Thai'], ingredients=['Rice', 'Basil']),
+            recipe_payload(2),
+        ]
+
+        result = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(result.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [item['title'] for item in result.data],
+            ['Recipe 0', 'Recipe 1', 'Recipe 2'],
+        )
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 2)
+        recipe = Recipe.objects.get(id=result.data[1]['id'])
+        self.assertEqual(recipe.price, Decimal('5.50'))
+        self.assertEqual(
+            sorted(recipe.ingredients.values_list('name', flat=True)),
+            ['Basil', 'Rice'],
+        )
+        self.assertEqual(
+            [tag['name'] for tag in result.data[0]['tags']],
+            ['Dinner', 'Thai'],
+        )
+
+    def test_bulk_query_count_constant(self):
+        """Test the number of queries does not grow with the batch"""
+        def post_batch(start, count):
+            payload = [
+                recipe_payload(
+                    start + i,
+                    tags=[f'Tag {start + i}'],
+                    ingredients=[f'Ingredient {start + i}', 'Salt'],
+                )
+                for i in range(count)
+            ]
+            with CaptureQueriesContext(connection) as ctx:
+                result = self.client.post(BULK_URL, payload, format='json')
+            self.assertEqual(result.status_code, status.HTTP_201_CREATED)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(post_batch(0, 2), post_batch(100, 40))
+
+    def test_bulk_invalid_item(self):
+        """Test an invalid item rejects the whole batch with item errors"""
+        invalid = recipe_payload(1)
+        del invalid['title']
+        payload = [recipe_payload(0), invalid]
+
+        result = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(result.data[0], {})
+        self.assertIn('title', result.data[1])
+        self.assertFalse(Recipe.objects.exists())
+
+    @override_settings(RECIPE_API_BULK_MAX_ITEMS=2)
+    def test_bulk_too_many_items(self):
+        """Test the batch size is limited before items are validated"""
+        payload = [recipe_payload(i) for i in range(3)]
+        del payload[0]['title']
+
+        with patch.object(RecipeSerializer, 'run_validation') as validate:
+            result = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            result.data,
+            {'non_field_errors': ['Ensure this list has at most 2 items.']},
+        )
+        validate.assert_not_called()
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_invalidates_cache(self):
+        """Test bulk creating bumps the user's cache version"""
+        version = cache.get_user_version(self.user.id)
+
+        self.client.post(BULK_URL, [recipe_payload(0)], format='json')
+
+        self.assertNotEqual(cache.get_user_version(self.user.id), version)
@@ -0,0 +1,170 @@
+"""
+Tests for the recipe API response cache.
+"""
+from decimal import Decimal
+import tempfile
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+from recipe import cache
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'recipe-api-tests',
+    }
+}
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+@override_settings(RECIPE_API_CACHE_ENABLED=True, CACHES=LOCMEM_CACHES)
+class RecipeCacheTests(TestCase):
+    """Test caching of list responses"""
+
+    def setUp(self):
+        cache.get_cache().clear()
+        cache.stats.reset()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_served_from_cache(self):
+        """Test a repeated list request only runs the validator query"""
+        create_recipe(user=self.user)
+        first = self.client.get(RECIPES_URL)
+
+        with self.assertNumQueries(1):
+            second = self.client.get(RECIPES_URL)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(cache.stats.as_dict(), {'hits': 1, 'misses': 1})
+
+    def test_query_params_normalized(self):
+        """Test param order does not change the cache entry"""
+        self.client.get(RECIPES_URL, {'tags': '1', 'match': 'all'})
+        self.client.get(f'{RECIPES_URL}?match=all&tags=1')
+        self.client.get(RECIPES_URL, {'tags': '2', 'match': 'all'})
+
+        self.assertEqual(cache.stats.as_dict(), {'hits': 1, 'misses': 2})
+
+    def test_create_invalidates(self):
+        """Test creating a recipe invalidates the cached list"""
+        self.client.get(RECIPES_URL)
+        payload = {
+            'title': 'New recipe',
+            'time_minutes': 5,
+            'price': Decimal('1.00'),
+        }
+        self.client.post(RECIPES_URL, payload)
+
+        result = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(result.data), 1)
+
+    def test_m2m_change_invalidates(self):
+        """Test changing recipe tags invalidates the cached list"""
+        recipe = create_recipe(user=self.user)
+        self.client.get(RECIPES_URL)
+
+        url = reverse('recipe:recipe-detail', args=[recipe.id])
+        self.client.patch(url, {'tags': [{'name': 'Vegan'}]}, format='json')
+        result = self.client.get(RECIPES_URL)
+
+        self.assertEqual(result.data[0]['tags'][0]['name'], 'Vegan')
+
+    def test_tag_rename_invalidates_recipes(self):
+        """Test renaming a tag invalidates recipe and tag lists"""
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Lunch')
+        recipe.tags.add(tag)
+        self.client.get(RECIPES_URL)
+        self.client.get(TAGS_URL)
+
+        url = reverse('recipe:tag-detail', args=[tag.id])
+        self.client.patch(url, {'name': 'Brunch'})
+
+        recipes = self.client.get(RECIPES_URL)
+        tags = self.client.get(TAGS_URL)
+        self.assertEqual(recipes.data[0]['tags'][0]['name'], 'Brunch')
+        self.assertEqual(tags.data[0]['name'], 'Brunch')
+
+    def test_image_upload_invalidates(self):
+        """Test uploading an image invalidates cached responses"""
+        recipe = create_recipe(user=self.user)
+        version = cache.get_user_version(self.user.id)
+
+        url = reverse('recipe:recipe-upload-image', args=[recipe.id])
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            self.client.post(url, {'image': image_file}, format='multipart')
+        recipe.refresh_from_db()
+        recipe.image.delete()
+
+        self.assertNotEqual(cache.get_user_version(self.user.id), version)
+
+    def test_other_users_writes_do_not_invalidate(self):
+        """Test cached entries are isolated per user"""
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='test123',
+        )
+        self.client.get(RECIPES_URL)
+
+        create_recipe(user=other)
+        self.client.get(RECIPES_URL)
+
+        self.assertEqual(cache.stats.as_dict(), {'hits': 1, 'misses': 1})
+
+    def test_file_backend(self):
+        """Test the cache works with the file based backend"""
+        with tempfile.TemporaryDirectory() as location:
+            caches = {
+                'default': {
+                    'BACKEND':
+                        'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': location,
+                }
+            }
+            with self.settings(CACHES=caches):
+                create_recipe(user=self.user)
+                self.client.get(RECIPES_URL)
+                with self.assertNumQueries(1):
+                    result = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(result.data), 1)
+
+    @override_settings(RECIPE_API_CACHE_ENABLED=False)
+    def test_disabled(self):
+        """Test nothing is cached when the cache is disabled"""
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+
+        self.assertEqual(cache.stats.as_dict(), {'hits': 0, 'misses': 0})
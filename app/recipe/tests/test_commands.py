@@ -0,0 +1,211 @@
+"""
+Tests for recipe management commands.
+"""
+from decimal import Decimal
+from io import StringIO
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.models import Recipe, Tag, Ingredient, ImportProgress
+
+from recipe.search import search_recipes
+
+
+class BenchmarkCommandTests(TestCase):
+    """Test the benchmark_recipes command"""
+
+    def test_benchmark_filters(self):
+        """Test the filter benchmark runs and leaves no data behind"""
+        out = StringIO()
+
+        call_command(
+            'benchmark_recipes',
+            'filters',
+            recipes=20,
+            iterations=1,
+            stdout=out,
+        )
+
+        self.assertIn('exists (any)', out.getvalue())
+        self.assertIn('grouped semi-join (all)', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_benchmark_bulk_create(self):
+        """Test the bulk create benchmark reports throughput"""
+        out = StringIO()
+
+        call_command(
+            'benchmark_recipes',
+            'bulk_create',
+            recipes=20,
+            batch_size=3,
+            stdout=out,
+        )
+
+        self.assertIn('bulk POST', out.getvalue())
+        self.assertIn('recipes/s', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_benchmark_import(self):
+        """Test the import benchmark reports rows per second"""
+        out = StringIO()
+
+        call_command(
+            'benchmark_recipes',
+            'import',
+            recipes=20,
+            batch_size=3,
+            stdout=out,
+        )
+
+        self.assertIn('import_recipes (COPY)', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+
+class ImportRecipesCommandTests(TestCase):
+    """Test the import_recipes command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+        )
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_file(self, name, content):
+        """Write content to a temporary file and return its path"""
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(content)
+        return path
+
+    def write_ndjson(self, records):
+        """Write records as NDJSON and return the path"""
+        return self.write_file(
+            'recipes.ndjson',
+            ''.join(json.dumps(record) + '\n' for record in records),
+        )
+
+    def call_import(self, path, **options):
+        """Run the import command for the test user"""
+        out = StringIO()
+        call_command(
+            'import_recipes',
+            path,
+            user=self.user.email,
+            stdout=out,
+            **options,
+        )
+        return out.getvalue()
+
+    def test_import_ndjson(self):
+        """Test importing recipes with nested tags and ingredients"""
+        existing = Tag.objects.create(user=self.user, name='Thai')
+        path = self.write_ndjson([
+            {
+                'title': 'Curry',
+                'description': 'Tabs\tnew\nlines and \\ slashes',
+                'time_minutes': 30,
+                'price': '5.50',
+                'tags': [{'name': 'Thai'}, {'name': 'Dinner'}],
+                'ingredients': ['Rice', 'Basil'],
+            },
+            {
+                'title': 'Soup',
+                'time_minutes': 15,
+                'price': '2.00',
+                'tags': ['Dinner'],
+                'ingredients': ['Basil'],
+            },
+        ])
+
+        out = self.call_import(path, batch_size=1)
+
+        self.assertIn('Imported 2 recipes with 6 links', out)
+        self.assertIn('rows/s', out)
+        curry = Recipe.objects.get(user=self.user, title='Curry')
+        self.assertEqual(curry.price, Decimal('5.50'))
+        self.assertEqual(
+            curry.description,
+            'Tabs\tnew\nlines and \\ slashes',
+        )
+        self.assertIn(existing, curry.tags.all())
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 2)
+        soup = Recipe.objects.get(user=self.user, title='Soup')
+        self.assertEqual(
+            list(soup.ingredients.values_list('name', flat=True)),
+            ['Basil'],
+        )
+        self.assertCountEqual(
+            search_recipes(Recipe.objects.all(), 'basil'),
+            [curry, soup],
+        )
+        new = Recipe.objects.create(
+            user=self.user,
+            title='After import',
+            time_minutes=1,
+            price=Decimal('1.00'),
+        )
+        self.assertGreater(new.id, soup.id)
+
+    def test_import_csv(self):
+        """Test importing the CSV export format"""
+        path = self.write_file(
+            'recipes.csv',
+            'id,title,description,time_minutes,price,link,tags,'
+            'ingredients,image\n'
+            '7,Curry,,30,5.50,,Thai;Dinner,Rice,\n',
+        )
+
+        self.call_import(path)
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.title, 'Curry')
+        self.assertEqual(
+            sorted(recipe.tags.values_list('name', flat=True)),
+            ['Dinner', 'Thai'],
+        )
+
+    def test_import_invalid_record_and_resume(self):
+        """Test a failing batch is rolled back and can be resumed"""
+        records = [
+            {'title': f'Recipe {i}', 'time_minutes': 5, 'price': '1.00'}
+            for i in range(3)
+        ]
+        records[2]['price'] = 'free'
+        path = self.write_ndjson(records)
+
+        with self.assertRaisesRegex(CommandError, 'recipes.ndjson:3'):
+            self.call_import(path, batch_size=2)
+
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+        progress = ImportProgress.objects.get(user=self.user)
+        self.assertEqual(progress.records_done, 2)
+
+        records[2]['price'] = '3.00'
+        path = self.write_ndjson(records)
+        out = self.call_import(path, batch_size=2, resume=True)
+
+        self.assertIn('resuming after 2 records', out)
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('title', flat=True)),
+            ['Recipe 0', 'Recipe 1', 'Recipe 2'],
+        )
+
+    def test_import_unknown_user(self):
+        """Test importing for a missing user fails"""
+        path = self.write_ndjson([])
+
+        with self.assertRaises(CommandError):
+            call_command('import_recipes', path, user='nobody@example.com')
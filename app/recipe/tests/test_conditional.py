@@ -0,0 +1,176 @@
+"""
+Tests for conditional GET support on the recipe APIs.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETag and Last-Modified handling"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+
+    def assert_not_modified(self, url, etag):
+        """Assert a request with If-None-Match gets a 304"""
+        result = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(result.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(result['ETag'], etag)
+
+    def assert_modified(self, url, etag):
+        """Assert a request with If-None-Match gets a fresh 200"""
+        result = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(result['ETag'], etag)
+
+    def test_list_validators(self):
+        """Test list responses carry an ETag but no Last-Modified"""
+        result = self.client.get(RECIPES_URL)
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertTrue(result['ETag'].startswith('"'))
+        self.assertNotIn('Last-Modified', result)
+        self.assertIn('Authorization', result['Vary'])
+
+    def test_if_none_match_skips_serialization(self):
+        """Test a matching ETag returns 304 after the validator query only"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        with self.assertNumQueries(1):
+            self.assert_not_modified(RECIPES_URL, etag)
+
+    def test_if_modified_since(self):
+        """Test a current If-Modified-Since returns 304 for details"""
+        Recipe.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        url = detail_url(self.recipe.id)
+        last_modified = self.client.get(url)['Last-Modified']
+
+        result = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(result.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_no_last_modified_within_second(self):
+        """Test Last-Modified is left out until its second has passed"""
+        Recipe.objects.update(updated_at=timezone.now() + timedelta(hours=1))
+
+        result = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Last-Modified', result)
+
+    def test_list_delete_not_modified_since(self):
+        """Test deleting a recipe is not answered with a stale 304"""
+        Recipe.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        other = create_recipe(user=self.user, title='Another')
+        Recipe.objects.filter(id=other.id).update(
+            updated_at=timezone.now() - timedelta(hours=2),
+        )
+        since = self.client.get(detail_url(self.recipe.id))['Last-Modified']
+        other.delete()
+
+        result = self.client.get(RECIPES_URL, HTTP_IF_MODIFIED_SINCE=since)
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(result.data), 1)
+
+    def test_list_etag_changes_on_write(self):
+        """Test creating and deleting recipes changes the list ETag"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+        recipe = create_recipe(user=self.user, title='Another')
+        self.assert_modified(RECIPES_URL, etag)
+
+        etag = self.client.get(RECIPES_URL)['ETag']
+        recipe.delete()
+        self.assert_modified(RECIPES_URL, etag)
+
+    def test_list_etag_depends_on_params(self):
+        """Test different query params get different ETags"""
+        first = self.client.get(RECIPES_URL)['ETag']
+        second = self.client.get(RECIPES_URL, {'page_size': 10})['ETag']
+
+        self.assertNotEqual(first, second)
+
+    def test_detail_etag_changes_with_tags(self):
+        """Test changing tags of a recipe changes its ETag"""
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+        self.assert_not_modified(url, etag)
+
+        self.client.patch(url, {'tags': [{'name': 'Vegan'}]}, format='json')
+
+        self.assert_modified(url, etag)
+
+    def test_tag_rename_changes_recipe_etag(self):
+        """Test renaming a tag changes the ETag of recipes using it"""
+        tag = Tag.objects.create(user=self.user, name='Lunch')
+        self.recipe.tags.add(tag)
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        tag.name = 'Brunch'
+        tag.save()
+
+        self.assert_modified(RECIPES_URL, etag)
+
+    def test_tag_delete_changes_recipe_etag(self):
+        """Test deleting a tag changes the ETag of recipes using it"""
+        tag = Tag.objects.create(user=self.user, name='Lunch')
+        self.recipe.tags.add(tag)
+        etag = self.client.get(detail_url(self.recipe.id))['ETag']
+
+        tag.delete()
+
+        self.assert_modified(detail_url(self.recipe.id), etag)
+
+    def test_tag_list_etag_changes_when_assigned(self):
+        """Test assigning a tag changes the assigned_only tag list ETag"""
+        tag = Tag.objects.create(user=self.user, name='Lunch')
+        params = {'assigned_only': 1}
+        etag = self.client.get(TAGS_URL, params)['ETag']
+
+        self.recipe.tags.add(tag)
+
+        result = self.client.get(TAGS_URL, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(result.data), 1)
+
+    def test_missing_detail_not_found(self):
+        """Test a conditional request for a missing recipe is a 404"""
+        result = self.client.get(detail_url(0), HTTP_IF_NONE_MATCH='*')
+
+        self.assertEqual(result.status_code, status.HTTP_404_NOT_FOUND)
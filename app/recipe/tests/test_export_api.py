@@ -0,0 +1,169 @@
+"""
+Tests for the recipe export API.
+"""
+import csv
+from decimal import Decimal
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+from recipe.serializers import RecipeDetailSerializer
+
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.25'),
+        'description': 'Sample description',
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def read_content(result):
+    """Return the decoded body of a streaming response"""
+    return b''.join(result.streaming_content).decode()
+
+
+class PublicExportApiTests(TestCase):
+    """Test unauthenticated export requests"""
+
+    def test_auth_required(self):
+        """Test auth is required to export recipes"""
+        result = APIClient().get(EXPORT_URL)
+
+        self.assertEqual(result.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateExportApiTests(TestCase):
+    """Test authenticated export requests"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_export_ndjson(self):
+        """Test exporting recipes as newline delimited JSON"""
+        r1 = create_recipe(user=self.user, title='Curry')
+        r1.tags.add(Tag.objects.create(user=self.user, name='Thai'))
+        r2 = create_recipe(user=self.user, title='Soup')
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='test123',
+        )
+        create_recipe(user=other)
+
+        result = self.client.get(EXPORT_URL)
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertTrue(result.streaming)
+        self.assertTrue(result['Content-Type'].startswith(
+            'application/x-ndjson'
+        ))
+        lines = read_content(result).splitlines()
+        expected = RecipeDetailSerializer([r2, r1], many=True).data
+        self.assertEqual([json.loads(line) for line in lines], expected)
+
+    def test_export_csv(self):
+        """Test exporting recipes as CSV"""
+        recipe = create_recipe(user=self.user, title='Curry')
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Thai'))
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Rice'),
+            Ingredient.objects.create(user=self.user, name='Basil'),
+        )
+
+        result = self.client.get(EXPORT_URL, {'format': 'csv'})
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertIn('recipes.csv', result['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(read_content(result))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], 'Curry')
+        self.assertEqual(rows[0]['price'], '5.25')
+        self.assertEqual(rows[0]['tags'], 'Thai')
+        self.assertEqual(
+            sorted(rows[0]['ingredients'].split(';')),
+            ['Basil', 'Rice'],
+        )
+
+    def test_export_csv_by_accept_header(self):
+        """Test CSV can be requested with the Accept header"""
+        create_recipe(user=self.user)
+
+        result = self.client.get(EXPORT_URL, HTTP_ACCEPT='text/csv')
+
+        self.assertTrue(result['Content-Type'].startswith('text/csv'))
+
+    def test_export_applies_filters(self):
+        """Test the export honours tag filters"""
+        tagged = create_recipe(user=self.user, title='Tagged')
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        tagged.tags.add(tag)
+        create_recipe(user=self.user, title='Untagged')
+
+        result = self.client.get(EXPORT_URL, {'tags': f'{tag.id}'})
+
+        lines = read_content(result).splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [
+            tagged.id,
+        ])
+
+    @override_settings(RECIPE_EXPORT_BATCH_SIZE=2)
+    def test_export_reads_in_batches(self):
+        """Test recipes are read in bounded batches"""
+        for i in range(5):
+            create_recipe(user=self.user, title=f'Recipe {i}')
+
+        with CaptureQueriesContext(connection) as ctx:
+            result = self.client.get(EXPORT_URL)
+            lines = read_content(result).splitlines()
+
+        self.assertEqual(len(lines), 5)
+        recipe_queries = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith('SELECT "core_recipe"."id"')
+        ]
+        self.assertEqual(len(recipe_queries), 4)
+        for sql in recipe_queries:
+            self.assertIn('LIMIT 2', sql)
+
+    @override_settings(RECIPE_EXPORT_BATCH_SIZE=2)
+    def test_export_search_in_batches(self):
+        """Test a search export keeps every match across batches"""
+        recipes = [
+            create_recipe(
+                user=self.user,
+                title=f'Apple {"cake " * i}{i}',
+                description='apple ' * (5 - i),
+            )
+            for i in range(6)
+        ]
+        create_recipe(user=self.user, title='Pear')
+
+        result = self.client.get(EXPORT_URL, {'search': 'apple'})
+
+        lines = read_content(result).splitlines()
+        self.assertEqual(
+            [json.loads(line)['id'] for line in lines],
+            [recipe.id for recipe in reversed(recipes)],
+        )
@@ -0,0 +1,123 @@
+"""
+Tests the fast list path renders exactly what the serializers render.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+class FastListParityTests(TestCase):
+    """Compare list responses with and without the fast path"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+        )
+        self.client.force_authenticate(self.user)
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ['Vegan', 'Dinner', 'Quick']
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ['Salt', 'Flour', 'Émincé']
+        ]
+        Ingredient.objects.create(user=self.user, name='Unused')
+        prices = [Decimal('5.5'), Decimal('0.00'), Decimal('123.45')]
+        for i, price in enumerate(prices):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe "{i}" ünïcode',
+                description=f'Description {i}',
+                time_minutes=i * 10,
+                price=price,
+                link='' if i else 'https://example.com/recipe',
+            )
+            # Linked out of ID order
+            recipe.tags.add(*reversed(tags[:i + 1]))
+            recipe.ingredients.add(*ingredients[i:])
+        recipe.image = 'uploads/recipe/ab/abc.jpg'
+        recipe.image_variants = {'thumbnail': 'uploads/recipe/ab/abc_200.jpg'}
+        recipe.save()
+        Recipe.objects.create(
+            user=self.user,
+            title='Bare',
+            time_minutes=1,
+            price=Decimal('1'),
+        )
+
+    def assertParity(self, url, params=None):
+        """Assert both paths return the same bytes"""
+        with override_settings(RECIPE_API_FAST_LIST=False):
+            expected = self.client.get(url, params)
+        result = self.client.get(url, params)
+
+        self.assertEqual(expected.status_code, status.HTTP_200_OK)
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(result.content, expected.content, params)
+        return result
+
+    def test_recipe_list(self):
+        """Test full, sparse, filtered and searched recipe lists"""
+        tag = Tag.objects.get(name='Dinner')
+        for params in [
+            None,
+            {'fields': 'id,title,price'},
+            {'fields': 'title,tags,ingredients'},
+            {'fields': 'tags,ingredients', 'expand': 'tags'},
+            {'fields': 'image_variants,link,time_minutes'},
+            {'tags': str(tag.id)},
+            {'search': 'recipe'},
+            {'search': 'recipe', 'fields': 'id'},
+        ]:
+            self.assertParity(RECIPES_URL, params)
+
+    def test_recipe_pages(self):
+        """Test cursor pages, including the cursor links"""
+        result = self.assertParity(RECIPES_URL, {'page_size': 2})
+        self.assertParity(result.data['next'])
+        result = self.assertParity(
+            RECIPES_URL,
+            {'page_size': 1, 'search': 'recipe', 'fields': 'title'},
+        )
+        self.assertParity(result.data['next'])
+
+    def test_attr_lists(self):
+        """Test tag and ingredient lists"""
+        for url in (TAGS_URL, INGREDIENTS_URL):
+            self.assertParity(url)
+            self.assertParity(url, {'assigned_only': 1})
+            self.assertParity(url, {'fields': 'name'})
+            result = self.assertParity(url, {'page_size': 2})
+            self.assertParity(result.data['next'])
+
+    def test_empty_list(self):
+        """Test a user without recipes"""
+        self.client.force_authenticate(get_user_model().objects.create_user(
+            email='other@example.com',
+            password='test123',
+        ))
+
+        self.assertParity(RECIPES_URL)
+
+    def test_fast_list_queries(self):
+        """Test one query per relation, whatever the number of recipes"""
+        # ETag validators, rows, tags, ingredients
+        with self.assertNumQueries(4):
+            self.client.get(RECIPES_URL)
+        with self.assertNumQueries(2):
+            self.client.get(RECIPES_URL, {'fields': 'id,title'})
@@ -0,0 +1,184 @@
+"""
+Tests for resized recipe image variants.
+"""
+from decimal import Decimal
+import hashlib
+from io import BytesIO
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import jobs
+from core.models import ImageBlob, Job, Recipe
+
+
+def image_upload_url(recipe_id):
+    """Create and return an image upload URL"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def image_file(size, mode='RGB', image_format='JPEG', name='photo.jpg'):
+    """Return an uploadable image of the given size"""
+    buffer = BytesIO()
+    Image.new(mode, size).save(buffer, format=image_format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(
+    JOBS_EAGER=True,
+    RECIPE_IMAGE_VARIANTS={'thumbnail': 100, 'medium': 400, 'large': 1600},
+)
+class ImageVariantTests(TestCase):
+    """Test generating and serving image variants"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=5,
+            price=Decimal('1.00'),
+        )
+
+    def tearDown(self):
+        storage = Recipe._meta.get_field('image').storage
+        for blob in ImageBlob.objects.all():
+            for name in [blob.name, *blob.variants.values()]:
+                storage.delete(name)
+
+    def upload(self, upload):
+        """Upload an image, running the deferred variant generation"""
+        with self.captureOnCommitCallbacks(execute=True):
+            result = self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': upload},
+                format='multipart',
+            )
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        return result
+
+    def test_upload_generates_variants(self):
+        """Test smaller variants are stored and larger ones fall back"""
+        upload = image_file((1000, 500))
+        result = self.upload(upload)
+
+        self.assertEqual(result.data['image_width'], 1000)
+        self.assertEqual(result.data['image_height'], 500)
+        self.assertEqual(result.data['image_size'], upload.size)
+        variants = self.recipe.image_variants
+        self.assertEqual(sorted(variants), ['medium', 'thumbnail'])
+        with Image.open(self.recipe.image.storage.path(
+            variants['thumbnail']
+        )) as thumbnail:
+            self.assertEqual(thumbnail.size, (100, 50))
+            self.assertEqual(thumbnail.format, 'JPEG')
+
+        result = self.client.get(reverse('recipe:recipe-list'))
+        urls = result.data[0]['image_variants']
+        self.assertTrue(urls['thumbnail'].endswith(variants['thumbnail']))
+        self.assertTrue(urls['medium'].endswith(variants['medium']))
+        self.assertTrue(urls['large'].endswith(self.recipe.image.name))
+
+    def test_variants_keep_transparency(self):
+        """Test images with alpha are resized to PNG"""
+        self.upload(image_file((500, 500), 'RGBA', 'PNG', 'logo.png'))
+
+        name = self.recipe.image_variants['thumbnail']
+        self.assertTrue(name.endswith('.png'))
+        with Image.open(self.recipe.image.storage.path(name)) as thumbnail:
+            self.assertEqual(thumbnail.mode, 'RGBA')
+
+    def test_original_served_until_ready(self):
+        """Test variant URLs point at the original before generation"""
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            result = self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': image_file((1000, 1000))},
+                format='multipart',
+            )
+
+        self.assertTrue(callbacks)
+        self.assertEqual(
+            set(result.data['image_variants'].values()),
+            {result.data['image']},
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, {})
+
+    def test_duplicate_uploads_share_file(self):
+        """Test the same image uploaded twice is stored and resized once"""
+        data = image_file((500, 500)).read()
+        self.upload(SimpleUploadedFile('a.jpg', data))
+        other = Recipe.objects.create(
+            user=self.user,
+            title='Other recipe',
+            time_minutes=5,
+            price=Decimal('1.00'),
+        )
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            result = self.client.post(
+                image_upload_url(other.id),
+                {'image': SimpleUploadedFile('b.jpg', data)},
+                format='multipart',
+            )
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        other.refresh_from_db()
+        self.assertEqual(other.image.name, self.recipe.image.name)
+        self.assertEqual(other.image_variants, self.recipe.image_variants)
+        self.assertIn(
+            hashlib.sha256(data).hexdigest(),
+            self.recipe.image.name,
+        )
+        blob = ImageBlob.objects.get(name=other.image.name)
+        self.assertEqual(blob.refcount, 2)
+        # Only the cache invalidation, the variants already exist
+        self.assertEqual(len(callbacks), 1)
+
+    def test_references_released(self):
+        """Test replacing an image or deleting a recipe drops references"""
+        self.upload(image_file((50, 50)))
+        first = self.recipe.image.name
+        self.upload(image_file((60, 60)))
+        second = self.recipe.image.name
+
+        # Unused once released, so deleted after the upload committed
+        self.assertFalse(ImageBlob.objects.filter(name=first).exists())
+        self.assertEqual(ImageBlob.objects.get(name=second).refcount, 1)
+
+        self.upload(image_file((60, 60)))
+        self.assertEqual(ImageBlob.objects.get(name=second).refcount, 1)
+
+        with self.captureOnCommitCallbacks(execute=False):
+            self.recipe.delete()
+        self.assertEqual(ImageBlob.objects.get(name=second).refcount, 0)
+
+    @override_settings(JOBS_EAGER=False)
+    def test_variants_generated_by_job(self):
+        """Test generation is queued for the job workers"""
+        self.upload(image_file((300, 300)))
+
+        blob = ImageBlob.objects.get(name=self.recipe.image.name)
+        job = Job.objects.get()
+        self.assertEqual(job.name, 'recipe.images.generate_variants')
+        self.assertEqual(job.args, [blob.id])
+        self.assertEqual(self.recipe.image_variants, {})
+
+        jobs.run_job(jobs.claim('test')[0])
+        self.recipe.refresh_from_db()
+        self.assertEqual(sorted(self.recipe.image_variants), ['thumbnail'])
+        self.assertFalse(Job.objects.exists())
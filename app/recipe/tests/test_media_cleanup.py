@@ -0,0 +1,221 @@
+"""
+Tests for cleaning up unused recipe image files.
+"""
+from decimal import Decimal
+from io import BytesIO, StringIO
+import os
+import shutil
+import tempfile
+import time
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ImageBlob, Recipe
+
+from recipe import images
+
+
+def image_file(size, name='photo.jpg'):
+    """Return an uploadable image of the given size"""
+    buffer = BytesIO()
+    Image.new('RGB', size).save(buffer, format='JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+def age(path, hours=48):
+    """Make a file look older than the grace period"""
+    then = time.time() - hours * 3600
+    os.utime(path, (then, then))
+
+
+@override_settings(
+    JOBS_EAGER=True,
+    RECIPE_IMAGE_VARIANTS={'thumbnail': 100},
+)
+class MediaCleanupTests(TestCase):
+    """Test unused image files are deleted"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.storage = Recipe._meta.get_field('image').storage
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = self.create_recipe()
+
+    def create_recipe(self):
+        return Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=5,
+            price=Decimal('1.00'),
+        )
+
+    def upload(self, recipe, upload):
+        """Upload an image, running the callbacks run after commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            result = self.client.post(
+                reverse('recipe:recipe-upload-image', args=[recipe.id]),
+                {'image': upload},
+                format='multipart',
+            )
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+        return [recipe.image.name, *recipe.image_variants.values()]
+
+    def files(self):
+        """Return the names of the stored files"""
+        found = set()
+        for root, _, filenames in os.walk(self.media_root):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                found.add(os.path.relpath(path, self.media_root))
+        return found
+
+    def cleanup(self, *args):
+        out = StringIO()
+        call_command('cleanup_media', *args, stdout=out)
+        return out.getvalue()
+
+    def test_replaced_image_deleted(self):
+        """Test replacing an image deletes the old files once committed"""
+        first = self.upload(self.recipe, image_file((300, 300)))
+        self.assertEqual(len(first), 2)
+        second = self.upload(self.recipe, image_file((200, 200)))
+
+        self.assertEqual(self.files(), set(second))
+        self.assertFalse(ImageBlob.objects.filter(name=first[0]).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+        self.assertEqual(self.files(), set())
+
+    def test_shared_image_kept(self):
+        """Test files are kept while another recipe uses them"""
+        data = image_file((300, 300)).read()
+        names = self.upload(self.recipe, SimpleUploadedFile('a.jpg', data))
+        other = self.create_recipe()
+        self.upload(other, SimpleUploadedFile('b.jpg', data))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+
+        self.assertEqual(self.files(), set(names))
+
+    def test_legacy_image_deleted(self):
+        """Test images stored before content addressing are cleaned up"""
+        self.recipe.image = self.storage.save(
+            'uploads/recipe/legacy.jpg',
+            image_file((10, 10)),
+        )
+        self.recipe.save()
+
+        self.upload(self.recipe, image_file((50, 50)))
+
+        self.assertNotIn('uploads/recipe/legacy.jpg', self.files())
+
+    def test_command_deletes_orphans(self):
+        """Test old unused files are deleted and counted"""
+        names = set(self.upload(self.recipe, image_file((300, 300))))
+        legacy = self.storage.save('uploads/recipe/legacy.jpg', ContentFile(
+            b'legacy',
+        ))
+        other = self.create_recipe()
+        other.image = legacy
+        other.image_variants = {'thumbnail': 'uploads/recipe/legacy_100.jpg'}
+        other.save()
+        self.storage.save('uploads/recipe/legacy_100.jpg', ContentFile(b'v'))
+        orphan = self.storage.save('uploads/recipe/orphan.jpg', ContentFile(
+            b'12345',
+        ))
+        recent = self.storage.save('uploads/recipe/recent.jpg', ContentFile(
+            b'upload in progress',
+        ))
+        stale = os.path.splitext(self.recipe.image.name)[0] + '_50.jpg'
+        self.storage.save(stale, ContentFile(b'123'))
+        for name in self.files() - {recent}:
+            age(self.storage.path(name))
+
+        output = self.cleanup('--batch-size', '2')
+
+        self.assertEqual(self.files(), names | {
+            legacy,
+            'uploads/recipe/legacy_100.jpg',
+            recent,
+        })
+        self.assertNotIn(orphan, self.files())
+        self.assertIn('found 2 orphans: 8 bytes reclaimed', output)
+
+    def test_command_dry_run(self):
+        """Test a dry run only reports"""
+        orphan = self.storage.save('uploads/recipe/orphan.jpg', ContentFile(
+            b'12345',
+        ))
+        age(self.storage.path(orphan))
+
+        output = self.cleanup('--dry-run')
+
+        self.assertIn('5 bytes would be reclaimed', output)
+        self.assertEqual(self.files(), {orphan})
+
+    def test_command_quarantine(self):
+        """Test orphans are moved aside, then deleted after the grace"""
+        orphan = self.storage.save('uploads/recipe/orphan.jpg', ContentFile(
+            b'12345',
+        ))
+        age(self.storage.path(orphan))
+
+        self.cleanup('--quarantine')
+        quarantined = os.path.join('quarantine', orphan)
+        self.assertEqual(self.files(), {quarantined})
+
+        self.cleanup('--quarantine')
+        self.assertEqual(self.files(), {quarantined})
+
+        age(os.path.join(self.media_root, quarantined))
+        output = self.cleanup('--quarantine')
+        self.assertEqual(self.files(), set())
+        self.assertIn('5 bytes purged', output)
+
+    def test_command_deletes_released_images(self):
+        """Test unreferenced stored images are removed with their rows"""
+        names = self.upload(self.recipe, image_file((300, 300)))
+        blob = ImageBlob.objects.get(name=names[0])
+        # As if the cleanup after the last release had failed
+        ImageBlob.objects.filter(pk=blob.pk).update(
+            refcount=0,
+            created_at=blob.created_at.replace(year=2000),
+        )
+        Recipe.objects.filter(pk=self.recipe.pk).update(image='')
+
+        self.cleanup()
+
+        self.assertEqual(self.files(), set())
+        self.assertFalse(ImageBlob.objects.filter(pk=blob.pk).exists())
+
+    def test_content_hash_of(self):
+        """Test only content addressed names yield a hash"""
+        content_hash = 'ab' * 32
+        self.assertEqual(
+            images.content_hash_of(images.content_name(content_hash, 'PNG')),
+            content_hash,
+        )
+        self.assertIsNone(images.content_hash_of('uploads/recipe/a.jpg'))
@@ -0,0 +1,109 @@
+"""
+Tests that the recipe API queries are served by indexes.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+class QueryPlanTests(TestCase):
+    """Capture EXPLAIN output for the list and filter endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user,
+            name='Tofu',
+        )
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i}',
+                time_minutes=10,
+                price=Decimal('1.00'),
+            )
+            recipe.tags.add(self.tag)
+            recipe.ingredients.add(self.ingredient)
+
+    def assert_index_only_plans(self, url, params=None):
+        """Fail if any SELECT issued by the request needs a Seq Scan"""
+        with CaptureQueriesContext(connection) as ctx:
+            result = self.client.get(url, params)
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+
+        selects = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith('SELECT')
+        ]
+        self.assertTrue(selects)
+        with connection.cursor() as cursor:
+            # Tiny test tables would otherwise always be scanned; with seq
+            # scans disabled one only appears when no index can be used.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            for sql in selects:
+                cursor.execute(f'EXPLAIN {sql}')
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+                self.assertNotIn('Seq Scan', plan, f'{sql}\n{plan}')
+
+    def test_recipe_list_plan(self):
+        """Test listing recipes uses indexes"""
+        self.assert_index_only_plans(RECIPES_URL)
+
+    def test_recipe_filter_plans(self):
+        """Test filtering recipes by tags and ingredients uses indexes"""
+        params = {
+            'tags': f'{self.tag.id}',
+            'ingredients': f'{self.ingredient.id}',
+        }
+        self.assert_index_only_plans(RECIPES_URL, params)
+        self.assert_index_only_plans(RECIPES_URL, {**params, 'match': 'all'})
+
+    def test_recipe_search_plans(self):
+        """Test searching recipes uses the search vector index"""
+        self.assert_index_only_plans(RECIPES_URL, {'search': 'vegan tofu'})
+        self.assert_index_only_plans(
+            RECIPES_URL,
+            {'search': 'recipe', 'page_size': 2},
+        )
+
+    def test_recipe_paginated_plan(self):
+        """Test paginating recipes uses indexes"""
+        self.assert_index_only_plans(RECIPES_URL, {'page_size': 2})
+
+    def test_tag_list_plans(self):
+        """Test listing tags uses indexes"""
+        self.assert_index_only_plans(TAGS_URL)
+        self.assert_index_only_plans(TAGS_URL, {'assigned_only': 1})
+
+    def test_ingredient_list_plans(self):
+        """Test listing ingredients uses indexes"""
+        self.assert_index_only_plans(INGREDIENTS_URL)
+        self.assert_index_only_plans(INGREDIENTS_URL, {'assigned_only': 1})
+
+    def test_autocomplete_plans(self):
+        """Test autocomplete uses the prefix indexes"""
+        for basename in ('tag', 'ingredient'):
+            self.assert_index_only_plans(
+                reverse(f'recipe:{basename}-autocomplete'),
+                {'prefix': 'to'},
+            )
@@ -8,7 +8,10 @@ import os
 from PIL import Image
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.db.models.signals import m2m_changed
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -291,6 +294,54 @@ class PrivateRecipeApiTests(TestCase):
         self.assertEqual(result.status_code, status.HTTP_200_OK)
         self.assertEqual(recipe.tags.count(), 0)
 
+    def test_update_tags_only_changes_diff(self):
+        """Test updating tags keeps links that did not change"""
+        recipe = create_recipe(user=self.user)
+        tags = [
+            Tag.objects.create(user=self.user, name=f'Tag {i}')
+            for i in range(5)
+        ]
+        recipe.tags.add(*tags)
+        through = Recipe.tags.through
+        kept_links = set(
+            through.objects.filter(
+                recipe=recipe,
+                tag__in=tags[:4],
+            ).values_list('id', flat=True)
+        )
+        changes = []
+
+        def record(sender, action, pk_set, **kwargs):
+            changes.append((action, pk_set))
+
+        payload = {
+            'tags': [{'name': f'Tag {i}'} for i in range(4)] + [
+                {'name': 'Brand new'},
+            ],
+        }
+        m2m_changed.connect(record, sender=through)
+        try:
+            result = self.client.patch(
+                detail_url(recipe.id),
+                payload,
+                format='json',
+            )
+        finally:
+            m2m_changed.disconnect(record, sender=through)
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        new_tag = Tag.objects.get(user=self.user, name='Brand new')
+        self.assertEqual(changes, [
+            ('pre_remove', {tags[4].id}),
+            ('post_remove', {tags[4].id}),
+            ('pre_add', {new_tag.id}),
+            ('post_add', {new_tag.id}),
+        ])
+        self.assertTrue(kept_links.issubset(
+            through.objects.filter(recipe=recipe).values_list('id', flat=True)
+        ))
+        self.assertEqual(len(result.data['tags']), 5)
+
     def test_create_recipe_with_new_ingredients(self):
         """Test Creating a recipe with new ingredients"""
         payload = {
@@ -379,6 +430,49 @@ class PrivateRecipeApiTests(TestCase):
         self.assertEqual(result.status_code, status.HTTP_200_OK)
         self.assertEqual(recipe.ingredients.count(), 0)
 
+    def test_create_nested_query_count_constant(self):
+        """Test creating nested tags and ingredients costs constant queries"""
+        Tag.objects.create(user=self.user, name='Tag 0')
+        Ingredient.objects.create(user=self.user, name='Ingredient 0')
+
+        def post_recipe(count):
+            payload = {
+                'title': f'Recipe with {count}',
+                'time_minutes': 10,
+                'price': Decimal('1.00'),
+                'tags': [{'name': f'Tag {i}'} for i in range(count)],
+                'ingredients': [
+                    {'name': f'Ingredient {i}'} for i in range(count)
+                ],
+            }
+            with CaptureQueriesContext(connection) as ctx:
+                result = self.client.post(RECIPES_URL, payload, format='json')
+            self.assertEqual(result.status_code, status.HTTP_201_CREATED)
+            return len(ctx.captured_queries)
+
+        small = post_recipe(2)
+        large = post_recipe(30)
+
+        self.assertEqual(small, large)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 30)
+        recipe = Recipe.objects.get(title='Recipe with 30')
+        self.assertEqual(recipe.tags.count(), 30)
+        self.assertEqual(recipe.ingredients.count(), 30)
+
+    def test_create_recipe_with_duplicate_tag_names(self):
+        """Test repeated tag names in a payload create a single tag"""
+        payload = {
+            'title': 'Ramen',
+            'time_minutes': 40,
+            'price': Decimal('8.00'),
+            'tags': [{'name': 'Noodle'}, {'name': 'Noodle'}],
+        }
+        result = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(result.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(len(result.data['tags']), 1)
+
     def test_filter_by_tags(self):
         """Test filtering recipe by tags"""
         r1 = create_recipe(user=self.user, title='Thai Vegetable Curry')
@@ -418,6 +512,163 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(s2.data, result.data)
         self.assertNotIn(s3.data, result.data)
 
+    def _create_recipes_with_relations(self, count):
+        """Create recipes that each have a tag and an ingredient"""
+        for i in range(count):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(Tag.objects.create(user=self.user, name=f'T{i}'))
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'I{i}')
+            )
+
+    def test_list_query_count_independent_of_size(self):
+        """Test listing recipes uses a constant number of queries"""
+        # Conditional GET validators, recipes, tags and ingredients
+        self._create_recipes_with_relations(2)
+        with self.assertNumQueries(4):
+            result = self.client.get(RECIPES_URL)
+        self.assertEqual(len(result.data), 2)
+
+        self._create_recipes_with_relations(10)
+        with self.assertNumQueries(4):
+            result = self.client.get(RECIPES_URL)
+        self.assertEqual(len(result.data), 12)
+        self.assertEqual(len(result.data[0]['tags']), 1)
+        self.assertEqual(len(result.data[0]['ingredients']), 1)
+
+    def test_list_defers_unused_columns(self):
+        """Test list query does not load the description"""
+        self._create_recipes_with_relations(1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(RECIPES_URL)
+
+        recipe_sql = next(
+            q['sql'] for q in ctx.captured_queries
+            if '"core_recipe"."title"' in q['sql']
+        )
+        self.assertNotIn('"core_recipe"."description"', recipe_sql)
+        self.assertNotIn('"core_recipe"."search_vector"', recipe_sql)
+
+    def test_detail_query_count(self):
+        """Test retrieving a recipe uses a constant number of queries"""
+        self._create_recipes_with_relations(1)
+        recipe = Recipe.objects.get(user=self.user)
+        for i in range(5):
+            recipe.tags.add(Tag.objects.create(user=self.user, name=f'X{i}'))
+
+        with self.assertNumQueries(4):
+            result = self.client.get(detail_url(recipe.id))
+        self.assertEqual(len(result.data['tags']), 6)
+        self.assertIn('description', result.data)
+
+    def test_filter_by_tags_no_duplicates(self):
+        """Test a recipe matching several tags is returned once"""
+        recipe = create_recipe(user=self.user)
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Quick')
+        recipe.tags.add(tag1, tag2)
+
+        params = {'tags': f'{tag1.id},{tag2.id}'}
+        result = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual([r['id'] for r in result.data], [recipe.id])
+
+    def test_filter_match_all(self):
+        """Test match=all returns recipes having every requested item"""
+        r1 = create_recipe(user=self.user, title='Tofu Stir Fry')
+        r2 = create_recipe(user=self.user, title='Lentil Soup')
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Quick')
+        ingredient = Ingredient.objects.create(user=self.user, name='Tofu')
+        r1.tags.add(tag1, tag2)
+        r1.ingredients.add(ingredient)
+        r2.tags.add(tag1)
+        r2.ingredients.add(ingredient)
+
+        params = {'tags': f'{tag1.id},{tag2.id}', 'match': 'all'}
+        result = self.client.get(RECIPES_URL, params)
+        self.assertEqual([r['id'] for r in result.data], [r1.id])
+
+        params = {
+            'tags': f'{tag1.id}',
+            'ingredients': f'{ingredient.id}',
+            'match': 'all',
+        }
+        result = self.client.get(RECIPES_URL, params)
+        self.assertEqual([r['id'] for r in result.data], [r2.id, r1.id])
+
+    def test_filter_invalid_match(self):
+        """Test an unknown match mode returns an error"""
+        result = self.client.get(RECIPES_URL, {'match': 'some'})
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_query_has_no_distinct(self):
+        """Test tag filtering does not need SELECT DISTINCT"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(RECIPES_URL, {'tags': f'{tag.id}'})
+
+        for query in ctx.captured_queries:
+            self.assertNotIn('DISTINCT', query['sql'])
+
+    def test_list_not_paginated_by_default(self):
+        """Test recipes list is a plain list without pagination params"""
+        create_recipe(user=self.user)
+
+        result = self.client.get(RECIPES_URL)
+
+        self.assertIsInstance(result.data, list)
+
+    def test_list_cursor_pagination(self):
+        """Test walking the recipe list with cursors"""
+        recipes = [
+            create_recipe(user=self.user, title=f'Recipe {i}')
+            for i in range(5)
+        ]
+        expected_ids = [r.id for r in reversed(recipes)]
+
+        result = self.client.get(RECIPES_URL, {'page_size': 2})
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertIsNone(result.data['previous'])
+        ids = [r['id'] for r in result.data['results']]
+        next_url = result.data['next']
+        while next_url:
+            result = self.client.get(next_url)
+            self.assertLessEqual(len(result.data['results']), 2)
+            ids += [r['id'] for r in result.data['results']]
+            next_url = result.data['next']
+
+        self.assertEqual(ids, expected_ids)
+        self.assertIsNotNone(result.data['previous'])
+
+    def test_cursor_stable_under_inserts(self):
+        """Test new recipes do not shift the following page"""
+        for i in range(4):
+            create_recipe(user=self.user, title=f'Recipe {i}')
+        first = self.client.get(RECIPES_URL, {'page_size': 2})
+        seen = [r['id'] for r in first.data['results']]
+
+        create_recipe(user=self.user, title='Newest')
+        second = self.client.get(first.data['next'])
+
+        ids = seen + [r['id'] for r in second.data['results']]
+        self.assertEqual(len(set(ids)), 4)
+
+    @override_settings(RECIPE_API_MAX_PAGE_SIZE=3)
+    def test_page_size_capped(self):
+        """Test requested page size is capped at the configured maximum"""
+        for i in range(5):
+            create_recipe(user=self.user, title=f'Recipe {i}')
+
+        result = self.client.get(RECIPES_URL, {'page_size': 100})
+
+        self.assertEqual(len(result.data['results']), 3)
+
+
 class ImageUploadTests(TestCase):
     """Tests for the image upload API"""
 
@@ -0,0 +1,163 @@
+"""
+Tests for full-text recipe search.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk-create')
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeSearchApiTests(TestCase):
+    """Test searching recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def search(self, text, **params):
+        """Return the titles found for text"""
+        result = self.client.get(RECIPES_URL, {'search': text, **params})
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        return [item['title'] for item in result.data]
+
+    def test_search_fields(self):
+        """Test searching titles, descriptions, tags and ingredients"""
+        curry = create_recipe(self.user, title='Green curry')
+        curry.tags.add(Tag.objects.create(user=self.user, name='Thai'))
+        soup = create_recipe(
+            self.user,
+            title='Soup',
+            description='Simmered for hours',
+        )
+        soup.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Leeks'),
+        )
+        create_recipe(get_user_model().objects.create_user(
+            email='other@example.com',
+            password='test123',
+        ), title='Curry')
+
+        self.assertEqual(self.search('curries'), ['Green curry'])
+        self.assertEqual(self.search('thai'), ['Green curry'])
+        self.assertEqual(self.search('simmer'), ['Soup'])
+        self.assertEqual(self.search('leek'), ['Soup'])
+        self.assertEqual(self.search('curry -green'), [])
+
+    def test_search_ranking(self):
+        """Test title matches rank above tag and description matches"""
+        create_recipe(self.user, title='Tacos', description='Lime on top')
+        tagged = create_recipe(self.user, title='Salad')
+        tagged.tags.add(Tag.objects.create(user=self.user, name='Lime'))
+        create_recipe(self.user, title='Lime pie')
+
+        self.assertEqual(self.search('lime'), ['Lime pie', 'Salad', 'Tacos'])
+
+    def test_search_follows_changes(self):
+        """Test edits, renames and removed links update the results"""
+        recipe = create_recipe(self.user, title='Pasta')
+        tag = Tag.objects.create(user=self.user, name='Quick')
+        recipe.tags.add(tag)
+        ingredient = Ingredient.objects.create(user=self.user, name='Garlic')
+        ingredient.recipe_set.add(recipe)
+        self.assertEqual(self.search('quick garlic'), ['Pasta'])
+
+        tag.name = 'Weeknight'
+        tag.save()
+        self.assertEqual(self.search('quick'), [])
+        self.assertEqual(self.search('weeknight'), ['Pasta'])
+
+        ingredient.recipe_set.clear()
+        self.assertEqual(self.search('garlic'), [])
+
+        tag.delete()
+        self.assertEqual(self.search('weeknight'), [])
+
+        result = self.client.patch(
+            reverse('recipe:recipe-detail', args=[recipe.id]),
+            {'title': 'Risotto'},
+        )
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.search('risotto'), ['Risotto'])
+
+    def test_search_bulk_created(self):
+        """Test recipes created in bulk are searchable"""
+        payload = [{
+            'title': 'Pancakes',
+            'time_minutes': 10,
+            'price': '2.00',
+            'ingredients': [{'name': 'Buttermilk'}],
+        }]
+        result = self.client.post(BULK_URL, payload, format='json')
+        self.assertEqual(result.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(self.search('buttermilk'), ['Pancakes'])
+
+    def test_search_paginated(self):
+        """Test paging through ranked results with tied ranks"""
+        for i in range(5):
+            create_recipe(self.user, title=f'Bread {i}')
+        create_recipe(self.user, title='Toast', description='Bread, toasted')
+
+        titles = []
+        params = {'search': 'bread', 'page_size': 2}
+        url = RECIPES_URL
+        while url:
+            result = self.client.get(url, params)
+            self.assertEqual(result.status_code, status.HTTP_200_OK)
+            titles += [item['title'] for item in result.data['results']]
+            url, params = result.data['next'], None
+
+        self.assertEqual(titles, self.search('bread'))
+        self.assertEqual(
+            titles,
+            ['Bread 4', 'Bread 3', 'Bread 2', 'Bread 1', 'Bread 0', 'Toast'],
+        )
+
+    def test_search_pages_without_duplicates(self):
+        """Test every page of a search follows on from the last"""
+        for i in range(12):
+            create_recipe(
+                self.user,
+                title=f'Apple {"cake " * (i % 4)}{i}',
+                description='apple ' * (i % 3),
+            )
+
+        ids = []
+        params = {'search': 'apple', 'page_size': 3}
+        url = RECIPES_URL
+        # Bounded, as a cursor stuck on a rank pages forever
+        for _ in range(10):
+            result = self.client.get(url, params)
+            self.assertEqual(result.status_code, status.HTTP_200_OK)
+            ids += [item['id'] for item in result.data['results']]
+            url, params = result.data['next'], None
+            if url is None:
+                break
+
+        self.assertEqual(len(ids), 12)
+        self.assertEqual(len(set(ids)), 12)
@@ -0,0 +1,145 @@
+"""
+Tests for sparse fieldsets on the recipe, tag and ingredient APIs.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class SparseFieldsetTests(TestCase):
+    """Test ?fields= and ?expand="""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user,
+            name='Salt',
+        )
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i}',
+                description='Long description',
+                time_minutes=5,
+                price=Decimal('1.00'),
+            )
+            recipe.tags.add(self.tag)
+            recipe.ingredients.add(self.ingredient)
+        self.recipe = recipe
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            result = self.client.get(url, params)
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        sql = ' '.join(query['sql'] for query in queries)
+        return result.data, sql
+
+    def test_fields_trim_output_and_query(self):
+        """Test only the requested columns are rendered and loaded"""
+        data, sql = self.get(RECIPES_URL, fields='id,title')
+
+        self.assertEqual(data[0], {'id': self.recipe.id, 'title': 'Recipe 2'})
+        self.assertNotIn('"core_recipe"."price"', sql)
+        self.assertNotIn('core_tag', sql)
+        self.assertNotIn('core_ingredient', sql)
+
+    def test_relations_as_ids_unless_expanded(self):
+        """Test relations are IDs, or objects when expanded"""
+        data, sql = self.get(RECIPES_URL, fields='id,tags')
+        self.assertEqual(data[0], {
+            'id': self.recipe.id,
+            'tags': [self.tag.id],
+        })
+        self.assertNotIn('"core_tag"."name"', sql)
+        self.assertNotIn('core_ingredient', sql)
+
+        data, _ = self.get(
+            RECIPES_URL,
+            fields='title,tags,ingredients',
+            expand='ingredients',
+        )
+        self.assertEqual(data[0]['tags'], [self.tag.id])
+        self.assertEqual(
+            data[0]['ingredients'],
+            [{'id': self.ingredient.id, 'name': 'Salt'}],
+        )
+
+    def test_default_output_unchanged(self):
+        """Test all fields and nested objects are returned by default"""
+        full, _ = self.get(RECIPES_URL)
+        expanded, _ = self.get(RECIPES_URL, expand='tags')
+
+        self.assertEqual(full, expanded)
+        self.assertEqual(
+            full[0]['tags'],
+            [{'id': self.tag.id, 'name': 'Vegan'}],
+        )
+
+    def test_detail_fields(self):
+        """Test detail only fields can be picked on the detail endpoint"""
+        url = reverse('recipe:recipe-detail', args=[self.recipe.id])
+
+        data, _ = self.get(url, fields='description,image_variants')
+
+        self.assertEqual(data, {
+            'description': 'Long description',
+            'image_variants': None,
+        })
+
+    def test_paginated_search(self):
+        """Test cursors still work with trimmed columns and search"""
+        data, _ = self.get(RECIPES_URL, fields='title', page_size=2)
+        self.assertEqual(data['results'], [
+            {'title': 'Recipe 2'},
+            {'title': 'Recipe 1'},
+        ])
+        with self.assertNumQueries(2):
+            result = self.client.get(data['next'])
+        self.assertEqual(result.data['results'], [{'title': 'Recipe 0'}])
+
+        data, _ = self.get(RECIPES_URL, fields='id', search='recipe 1')
+        self.assertEqual(data[0], {'id': self.recipe.id - 1})
+
+    def test_tag_fields(self):
+        """Test tags and ingredients support fields too"""
+        with CaptureQueriesContext(connection) as queries:
+            result = self.client.get(TAGS_URL, {'fields': 'name'})
+
+        self.assertEqual(result.data, [{'name': 'Vegan'}])
+        # The last query loads the tags, the first computes the ETag
+        self.assertNotIn('updated_at', queries[-1]['sql'])
+
+    def test_invalid_fields(self):
+        """Test unknown fields and expansions are rejected"""
+        for url, params in [
+            (RECIPES_URL, {'fields': 'id,secret'}),
+            (RECIPES_URL, {'fields': ''}),
+            (RECIPES_URL, {'fields': 'description'}),
+            (RECIPES_URL, {'expand': 'user'}),
+            (TAGS_URL, {'expand': 'recipes'}),
+        ]:
+            result = self.client.get(url, params)
+            self.assertEqual(
+                result.status_code,
+                status.HTTP_400_BAD_REQUEST,
+                params,
+            )
@@ -131,4 +131,19 @@ class PrivateTagsApiTests(TestCase):
         recipe2.tags.add(tag)
 
         result=self.client.get(TAGS_URL, {'assigned_only':1})
-        self.assertEqual(len(result.data), 1)
\ No newline at end of file
+        self.assertEqual(len(result.data), 1)
+
+    def test_tags_cursor_pagination(self):
+        """Test paginating tags with a cursor"""
+        for name in ['Apple', 'Banana', 'Cherry']:
+            Tag.objects.create(user=self.user, name=name)
+
+        result = self.client.get(TAGS_URL, {'page_size': 2})
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        names = [t['name'] for t in result.data['results']]
+        self.assertEqual(names, ['Cherry', 'Banana'])
+        result = self.client.get(result.data['next'])
+        names = [t['name'] for t in result.data['results']]
+        self.assertEqual(names, ['Apple'])
+        self.assertIsNone(result.data['next'])
@@ -0,0 +1,147 @@
+"""
+Tests for streaming recipe image uploads.
+"""
+from decimal import Decimal
+import hashlib
+from io import BytesIO
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+from recipe.uploads import RecipeImageUploadHandler, UploadTooLarge
+
+
+def image_bytes(size=(10, 10), image_format='JPEG'):
+    """Return an encoded image"""
+    buffer = BytesIO()
+    Image.new('RGB', size).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+class RecipeImageUploadHandlerTests(TestCase):
+    """Test the upload handler on its own"""
+
+    def stream(self, data, chunk_size=100):
+        """Feed data through a handler and return the completed file"""
+        handler = RecipeImageUploadHandler()
+        handler.new_file('image', 'photo.jpg', 'image/jpeg', len(data))
+        for start in range(0, len(data), chunk_size):
+            handler.receive_data_chunk(data[start:start + chunk_size], start)
+        return handler, handler.file_complete(len(data))
+
+    def test_stream_image(self):
+        """Test the file is hashed and described from its header"""
+        data = image_bytes((30, 20))
+
+        handler, file = self.stream(data)
+
+        self.assertEqual(file.read(), data)
+        self.assertEqual(file.content_hash, hashlib.sha256(data).hexdigest())
+        self.assertEqual(file.image_format, 'JPEG')
+        self.assertEqual((file.image_width, file.image_height), (30, 20))
+        file.close()
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=500)
+    def test_stops_at_size_limit(self):
+        """Test streaming stops at the chunk crossing the limit"""
+        handler = RecipeImageUploadHandler()
+        handler.new_file('image', 'photo.jpg', 'image/jpeg', None)
+        handler.receive_data_chunk(image_bytes()[:400], 0)
+        path = handler.file.temporary_file_path()
+
+        with self.assertRaises(UploadTooLarge):
+            handler.receive_data_chunk(b'x' * 200, 400)
+
+        self.assertTrue(handler.file.closed)
+        with self.assertRaises(FileNotFoundError):
+            open(path)
+
+    def test_header_checked_before_body(self):
+        """Test a header with too many pixels is rejected immediately"""
+        data = image_bytes((400, 300), 'PNG')
+
+        with override_settings(RECIPE_IMAGE_MAX_PIXELS=1000):
+            handler = RecipeImageUploadHandler()
+            handler.new_file('image', 'photo.png', 'image/png', None)
+            with self.assertRaisesRegex(Exception, 'too large'):
+                handler.receive_data_chunk(data[:100], 0)
+
+
+class ImageUploadApiTests(TestCase):
+    """Test uploads through the API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=5,
+            price=Decimal('1.00'),
+        )
+        self.url = reverse('recipe:recipe-upload-image', args=[self.recipe.id])
+
+    def tearDown(self):
+        self.recipe.refresh_from_db()
+        if self.recipe.image:
+            self.recipe.image.delete()
+
+    def upload(self, data, name='photo.jpg'):
+        return self.client.post(
+            self.url,
+            {'image': SimpleUploadedFile(name, data)},
+            format='multipart',
+        )
+
+    def test_upload_skips_full_verification(self):
+        """Test uploads are accepted from the streamed header checks"""
+        with patch.object(Image.Image, 'verify') as verify:
+            result = self.upload(image_bytes((30, 20)))
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(result.data['image_width'], 30)
+        self.assertEqual(result.data['image_height'], 20)
+        verify.assert_not_called()
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=1000)
+    def test_upload_too_large(self):
+        """Test oversized uploads are refused with 413"""
+        result = self.upload(image_bytes((10, 10)) + b'\0' * 70000)
+
+        self.assertEqual(
+            result.status_code,
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_upload_rejects_invalid_images(self):
+        """Test non-images, unsupported formats and huge images fail"""
+        result = self.upload(b'not an image at all')
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', result.data)
+
+        result = self.upload(image_bytes(image_format='GIF'), 'photo.gif')
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('GIF', str(result.data['image']))
+
+        with override_settings(RECIPE_IMAGE_MAX_PIXELS=99):
+            result = self.upload(image_bytes((10, 10)))
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
@@ -0,0 +1,104 @@
+"""
+Streaming upload handling for recipe images.
+
+Uploads go straight to a temporary file chunk by chunk. The handler
+hashes them, enforces the size limit as data arrives, and validates the
+image header from the first chunks. Oversized or invalid images are
+rejected before the rest of the body is read or any bitmap is decoded.
+"""
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image
+from rest_framework import exceptions, status
+
+
+# Room for the multipart boundaries and headers around the image itself
+MULTIPART_OVERHEAD = 64 * 2 ** 10
+# The header must be found within this many bytes (EXIF blocks included)
+HEADER_MAX_BYTES = 256 * 2 ** 10
+
+INVALID_IMAGE = 'Upload a valid image. The file you uploaded was either ' \
+                'not an image or a corrupted image.'
+
+
+class UploadTooLarge(exceptions.APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_code = 'upload_too_large'
+
+    def __init__(self):
+        limit = settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE
+        super().__init__(f'Uploads are limited to {limit} bytes.')
+
+
+def invalid_image(message=INVALID_IMAGE):
+    return exceptions.ValidationError({'image': [message]})
+
+
+class RecipeImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream an image upload to a temporary file, validating it on the fly.
+
+    Completed files carry ``content_hash`` (sha256 hex digest),
+    ``image_format``, ``image_width`` and ``image_height``.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        """Refuse requests announcing a body that cannot fit the limit"""
+        limit = settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD
+        if content_length > limit:
+            raise UploadTooLarge()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hash = hashlib.sha256()
+        self.head = b''
+        self.header = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE:
+            self._reject(UploadTooLarge())
+        self.hash.update(raw_data)
+        if self.header is None:
+            self.head += raw_data
+            self._read_header(complete=False)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        if self.header is None:
+            self._read_header(complete=True)
+        file = super().file_complete(file_size)
+        file.content_hash = self.hash.hexdigest()
+        file.image_format, file.image_width, file.image_height = self.header
+        return file
+
+    def _read_header(self, complete):
+        """Identify the image from the bytes received so far"""
+        try:
+            # Image.open only parses the header, pixels are never loaded
+            with Image.open(BytesIO(self.head)) as image:
+                header = (image.format, image.width, image.height)
+        except Image.DecompressionBombError:
+            self._reject(invalid_image('Image dimensions are too large.'))
+        except Exception:
+            if complete or len(self.head) >= HEADER_MAX_BYTES:
+                self._reject(invalid_image())
+            return
+
+        image_format, width, height = header
+        if image_format not in settings.RECIPE_IMAGE_FORMATS:
+            self._reject(invalid_image(
+                f'Unsupported image format {image_format}.'
+            ))
+        if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+            self._reject(invalid_image('Image dimensions are too large.'))
+        self.header = header
+        self.head = b''
+
+    def _reject(self, error):
+        """Drop the partial file and abort the upload"""
+        self.upload_interrupted()
+        raise error
@@ -2,6 +2,11 @@
 Views for the recipe api
 """
 
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Prefetch
+from django.http import StreamingHttpResponse
+
 from drf_spectacular.utils import extend_schema_view, extend_schema,OpenApiParameter, OpenApiTypes
 from rest_framework import (
     viewsets,
@@ -9,8 +14,8 @@ from rest_framework import (
     status,
 )
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
 from core.models import (
@@ -18,7 +23,43 @@ from core.models import (
     Tag,
     Ingredient,
 )
-from recipe import serializers
+from recipe import cache, fastpath, serializers, pagination, renderers, uploads
+from recipe.filters import filter_by_related
+from recipe.search import search_recipes
+from recipe.mixins import (
+    CachedListMixin,
+    ConditionalGetMixin,
+    ConditionalRetrieveMixin,
+    FastListMixin,
+    SparseFieldsetMixin,
+)
+from user.authentication import CachedTokenAuthentication
+
+
+EXPORT_CSV_COLUMNS = [
+    'id',
+    'title',
+    'description',
+    'time_minutes',
+    'price',
+    'link',
+    'tags',
+    'ingredients',
+    'image',
+]
+
+FIELDS_PARAMETER = OpenApiParameter(
+    'fields',
+    OpenApiTypes.STR,
+    description='Comma separated list of the fields to return, all by '
+                'default',
+)
+EXPAND_PARAMETER = OpenApiParameter(
+    'expand',
+    OpenApiTypes.STR,
+    description='Comma separated list of the relations picked with fields '
+                'to return as objects rather than IDs',
+)
 
 
 @extend_schema_view(
@@ -33,17 +74,38 @@ from recipe import serializers
                 'ingredients',
                 OpenApiTypes.STR,
                 description='Comma seperated list of ingredient IDs to filter'
-            )
+            ),
+            OpenApiParameter(
+                'match',
+                OpenApiTypes.STR, enum=['any', 'all'],
+                description='Return recipes matching any (default) or all '
+                            'of the requested tags and ingredients',
+            ),
+            OpenApiParameter(
+                'search',
+                OpenApiTypes.STR,
+                description='Full-text search over title, description, tag '
+                            'and ingredient names; results are ranked',
+            ),
+            FIELDS_PARAMETER,
+            EXPAND_PARAMETER,
         ]
-    )
+    ),
+    retrieve=extend_schema(parameters=[FIELDS_PARAMETER, EXPAND_PARAMETER]),
 )
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(SparseFieldsetMixin,
+                    ConditionalRetrieveMixin,
+                    CachedListMixin,
+                    FastListMixin,
+                    viewsets.ModelViewSet):
     """View for manage recipe APIs"""
     serializer_class = serializers.RecipeDetailSerializer
+    fast_list_class = fastpath.RecipeFastSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = pagination.RecipeCursorPagination
 
     def _params_to_ints(self, qs):
         """Convert a list of strings to integers"""
@@ -53,16 +115,50 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Retrieve recipes for authenticated user"""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        match = self.request.query_params.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': "Must be 'any' or 'all'."})
+        match_all = match == 'all'
         queryset = self.queryset
         if tags:
             tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = filter_by_related(queryset, 'tags', tag_ids, match_all)
         if ingredients:
             ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in = ingredient_ids)
-        return queryset.filter(
+            queryset = filter_by_related(
+                queryset,
+                'ingredients',
+                ingredient_ids,
+                match_all,
+            )
+        queryset = queryset.filter(
             user=self.request.user
-        ).order_by('-id').distinct()
+        ).defer('search_vector')
+        search_text = self.request.query_params.get('search', '').strip()
+        if search_text:
+            queryset = search_recipes(queryset, search_text).order_by(
+                '-rank',
+                '-id',
+            )
+        else:
+            queryset = queryset.order_by('-id')
+        if self.action in ('destroy', 'upload_image'):
+            return queryset
+        fields, expand = self.get_sparse_fields()
+        if fields is not None:
+            return self.sparse_queryset(queryset, fields, expand)
+        if self.action == 'list':
+            # List serializer never emits the description, so don't load it
+            queryset = queryset.defer('description')
+
+        # Ordered, so the output matches the fast list path
+        return queryset.prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch(
+                'ingredients',
+                queryset=Ingredient.objects.order_by('id'),
+            ),
+        )
 
     def get_serializer_class(self):
         """Return the serializer class for requests"""
@@ -77,9 +173,102 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
 
+    @extend_schema(
+        request=serializers.RecipeDetailSerializer(many=True),
+        responses=serializers.RecipeDetailSerializer(many=True),
+    )
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk_create(self, request):
+        """Create a list of recipes in a single transaction"""
+        serializer = self.get_serializer(data=request.data, many=True)
+
+        if serializer.is_valid():
+            with transaction.atomic():
+                serializer.save(user=self.request.user)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def _export_batches(self, queryset, batch_size):
+        """
+        Yield the queryset in keyset batches of batch_size, so each
+        batch gets its own tag/ingredient prefetch and memory stays flat
+        """
+        last_id = None
+        while True:
+            batch = queryset
+            if last_id is not None:
+                batch = batch.filter(id__lt=last_id)
+            batch = list(batch[:batch_size])
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1].id
+
+    def _export_csv_row(self, item):
+        """Flatten a serialized recipe into a CSV row"""
+        row = []
+        for column in EXPORT_CSV_COLUMNS:
+            value = item[column]
+            if column in ('tags', 'ingredients'):
+                value = ';'.join(obj['name'] for obj in value)
+            row.append(value)
+        return row
+
+    def _export_rows(self, queryset, renderer):
+        """Yield the rendered export, one chunk per batch"""
+        context = self.get_serializer_context()
+        batches = self._export_batches(
+            queryset,
+            settings.RECIPE_EXPORT_BATCH_SIZE,
+        )
+        if isinstance(renderer, renderers.CSVRenderer):
+            yield renderer.render_rows([EXPORT_CSV_COLUMNS])
+        for batch in batches:
+            data = serializers.RecipeDetailSerializer(
+                batch,
+                many=True,
+                context=context,
+            ).data
+            if isinstance(renderer, renderers.CSVRenderer):
+                yield renderer.render_rows(
+                    self._export_csv_row(item) for item in data
+                )
+            else:
+                yield renderer.render_lines(data)
+
+    @extend_schema(
+        responses={
+            (200, 'application/x-ndjson'): OpenApiTypes.STR,
+            (200, 'text/csv'): OpenApiTypes.STR,
+        },
+    )
+    @action(
+        methods=['GET'],
+        detail=False,
+        url_path='export',
+        renderer_classes=[renderers.NDJSONRenderer, renderers.CSVRenderer],
+    )
+    def export(self, request):
+        """Stream all recipes as NDJSON or, with ?format=csv, CSV"""
+        # Batches are keyed on the id, so search only filters here rather
+        # than ordering by rank
+        queryset = self.filter_queryset(self.get_queryset()).order_by('-id')
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            self._export_rows(queryset, renderer),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = \
+            f'attachment; filename="recipes.{renderer.format}"'
+        return response
+
     @action(methods=['POST'], detail=True, url_path = 'upload_image')
     def upload_image(self, request, pk=None):
         """Upload an image to recipe"""
+        # Must be in place before request.data is first accessed
+        request.upload_handlers = [
+            uploads.RecipeImageUploadHandler(request._request),
+        ]
         recipe = self.get_object()
         serializer = self.get_serializer(recipe, data=request.data)
 
@@ -96,17 +285,23 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 'assigned_only',
                 OpenApiTypes.INT, enum=[0, 1],
                 description='Filter by items assigned to recipes',
-            )
+            ),
+            FIELDS_PARAMETER,
         ]
     )
 )
-class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
+class BaseRecipeAttrViewSet(SparseFieldsetMixin,
+                            ConditionalGetMixin,
+                            CachedListMixin,
+                            FastListMixin,
+                            mixins.DestroyModelMixin,
                             mixins.UpdateModelMixin,
                             mixins.ListModelMixin,
                             viewsets.GenericViewSet):
     """ Base viewset for Recipe Attributes """
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = pagination.RecipeAttrCursorPagination
 
     def get_queryset(self):
         """ Filter queryset to authenticated user"""
@@ -116,18 +311,79 @@ class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
         queryset = self.queryset
         if assigned_only:
             queryset = queryset.filter(recipe__isnull=False)
-        return queryset.filter(
+        queryset = queryset.filter(
             user=self.request.user
             ).order_by('-name').distinct()
+        fields, expand = self.get_sparse_fields()
+        if fields is not None:
+            queryset = self.sparse_queryset(queryset, fields, expand)
+        return queryset
+
+    def _autocomplete_limit(self):
+        """Return the requested number of suggestions within bounds"""
+        try:
+            limit = int(self.request.query_params.get(
+                'limit',
+                settings.RECIPE_API_AUTOCOMPLETE_LIMIT,
+            ))
+        except ValueError:
+            raise ValidationError({'limit': 'A valid integer is required.'})
+        return max(1, min(limit, settings.RECIPE_API_AUTOCOMPLETE_MAX_LIMIT))
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'prefix',
+                OpenApiTypes.STR,
+                required=True,
+                description='Case-insensitive start of the name',
+            ),
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description='Maximum number of suggestions',
+            ),
+        ]
+    )
+    @action(methods=['GET'], detail=False, pagination_class=None)
+    def autocomplete(self, request):
+        """Return the most used names starting with a prefix"""
+        prefix = request.query_params.get('prefix', '').strip()
+        if not prefix:
+            raise ValidationError({'prefix': 'This field is required.'})
+        limit = self._autocomplete_limit()
+
+        timeout = settings.RECIPE_API_AUTOCOMPLETE_CACHE_TIMEOUT
+        if timeout:
+            key = cache.response_key(
+                request,
+                f'{self.basename}-autocomplete',
+            )
+            data = cache.get_response_data(key)
+            if data is not None:
+                return Response(data)
+
+        queryset = self.queryset.filter(
+            user=request.user,
+            name__istartswith=prefix,
+        ).annotate(
+            usage=Count('recipe'),
+        ).order_by('-usage', 'name')[:limit]
+        data = self.get_serializer(queryset, many=True).data
+        if timeout:
+            cache.set_response_data(key, data, timeout)
+        return Response(data)
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """Manage Tags in the database"""
     serializer_class = serializers.TagSerializer
+    fast_list_class = fastpath.TagFastSerializer
     queryset = Tag.objects.all()
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """Manage Ingredient in the database"""
     serializer_class = serializers.IngredientSerializer
+    fast_list_class = fastpath.IngredientFastSerializer
     queryset = Ingredient.objects.all()
 
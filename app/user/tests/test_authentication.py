@@ -0,0 +1,110 @@
+"""
+Tests for the cached token authentication.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user import authentication
+
+
+ME_URL = reverse('user:me')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auth-token-tests',
+    }
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating with cached tokens"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+            name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_cached(self):
+        """Test a repeated request only loads the user"""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(1) as queries:
+            result = self.client.get(ME_URL)
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(result.data['email'], self.user.email)
+        self.assertNotIn('authtoken_token', queries.captured_queries[0]['sql'])
+
+    def test_cached_entry_has_no_password(self):
+        """Test the cache holds the user id, not the user"""
+        self.client.get(ME_URL)
+
+        entry = caches['default'].get(
+            authentication._cache_key(self.token.key)
+        )
+        self.assertEqual(entry, {
+            'key': self.token.key,
+            'user_id': self.user.pk,
+            'is_active': True,
+        })
+
+    def test_deactivated_user_rejected_without_signal(self):
+        """Test a user deactivated elsewhere is rejected from the cache"""
+        self.client.get(ME_URL)
+
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            is_active=False,
+        )
+        result = self.client.get(ME_URL)
+
+        self.assertEqual(result.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_token_rejected(self):
+        """Test an unknown token is rejected"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        result = self.client.get(ME_URL)
+
+        self.assertEqual(result.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_invalidated(self):
+        """Test deleting a token revokes it immediately"""
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        result = self.client.get(ME_URL)
+
+        self.assertEqual(result.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        """Test deactivating a user revokes the cached token"""
+        self.client.get(RECIPES_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        result = self.client.get(RECIPES_URL)
+
+        self.assertEqual(result.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_invalidated(self):
+        """Test updating the user through the API refreshes the cache"""
+        self.client.get(ME_URL)
+
+        self.client.patch(ME_URL, {'name': 'Updated Name'})
+        result = self.client.get(ME_URL)
+
+        self.assertEqual(result.data['name'], 'Updated Name')
@@ -5,9 +5,43 @@ server{
         alias /vol/static;
     }
 
+    # Recipe images are named after their content and never rewritten
+    location /static/media/uploads/recipe/ {
+        alias /vol/static/media/uploads/recipe/;
+        add_header Cache-Control "public, max-age=31536000, immutable";
+    }
+
+    # Orphaned images moved aside by cleanup_media --quarantine
+    location /static/media/quarantine/ {
+        deny all;
+    }
+
+    # Prometheus scrapes from the internal networks only, with the
+    # METRICS_TOKEN bearer token checked by the app
+    location = /metrics {
+        allow                  127.0.0.0/8;
+        allow                  10.0.0.0/8;
+        allow                  172.16.0.0/12;
+        allow                  192.168.0.0/16;
+        deny                   all;
+        uwsgi_pass             ${APP_HOST}:${APP_PORT};
+        include                /etc/nginx/uwsgi_params;
+    }
+
     location / {
         uwsgi_pass             ${APP_HOST}:${APP_PORT};
         include                /etc/nginx/uwsgi_params;
         client_max_body_size   10M;
+
+        # API payloads, as core.middleware.COMPRESSIBLE_TYPES; the app
+        # sets Vary. Streamed exports have no length and are always gzipped.
+        gzip                   on;
+        gzip_comp_level        5;
+        gzip_min_length        1024;
+        gzip_proxied           any;
+        gzip_types             application/json application/msgpack
+                               application/vnd.oai.openapi
+                               application/vnd.oai.openapi+json
+                               application/x-ndjson text/csv;
     }
 }
\ No newline at end of file